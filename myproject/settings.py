@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "trendline.routers.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -88,6 +90,66 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections open between requests (seconds) and check them before reuse
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Take the write lock when a transaction starts, so concurrent
+            # writers queue on the busy timeout instead of deadlocking
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+    }
+}
+
+# Applied to every new SQLite connection by trendline.db.configure_sqlite
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe with WAL; fsync at checkpoints, not every commit
+    "busy_timeout": 20000,  # ms
+    "cache_size": -20000,  # KiB (about 20 MB)
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+}
+
+# Optional read replica: a copy of the SQLite file kept fresh with
+# `python manage.py sync_replica --loop` (or a second database server).
+# Reads of the article store, activity/session analytics and profiles go to
+# it; a user's own reads stay on the primary for a few seconds after a write.
+DB_REPLICA_PATH = os.getenv("DB_REPLICA_PATH")
+if DB_REPLICA_PATH:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": DB_REPLICA_PATH,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["trendline.routers.ReplicaRouter"]
+# How often sync_replica --loop copies the primary. A replica can lag by up to
+# one interval plus the copy itself, so a writer's reads stay pinned to the
+# primary for longer than that; keep the two in step when changing either.
+DB_REPLICA_SYNC_INTERVAL = int(os.getenv("DB_REPLICA_SYNC_INTERVAL", "30"))
+DB_REPLICA_STICKY_SECONDS = DB_REPLICA_SYNC_INTERVAL + 15
+
+# Serialized /api/profile/ responses, cached per user and replaced on every
+# profile write. That invalidation only reaches the cache of the process that
+# made the write: with the per-process LocMemCache below, other workers can
+# serve the old profile until their copy expires, so the TTL bounds how stale
+# a profile can get. Point PROFILE_CACHE_ALIAS at a shared cache (Redis,
+# Memcached) before raising it; unchanged profiles still get 304s either way,
+# since the ETag is a hash of the content.
+PROFILE_CACHE_ALIAS = "default"
+PROFILE_CACHE_TTL = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory in development; point this at Redis/Memcached in production
+# so the NewsAPI response cache is shared between workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "trendline",
     }
 }
 
@@ -111,9 +173,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Log in with a username or an email address, checking the password once
+
+AUTHENTICATION_BACKENDS = [
+    "trendline.backends.EmailOrUsernameBackend",
+]
+
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded avatars are re-encoded (metadata stripped, longest side capped) and
+# square thumbnails are made by a background thread; run
+# `python manage.py process_avatars` to backfill older uploads
+AVATAR_MAX_DIMENSION = 1024
+AVATAR_THUMBNAIL_SIZES = [64, 128, 256]
+AVATAR_QUALITY = 82
+AVATAR_ASYNC_THUMBNAILS = True
+
 
 #AUTH_USER_MODEL = 'trendline.CustomUser'
 
@@ -150,3 +227,57 @@ load_dotenv()  # this will read .env file
 # Now available across project
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# NewsAPI
+# Required, from the environment or .env only; the news client refuses to
+# call NewsAPI (ImproperlyConfigured) while it is unset
+NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+NEWS_API_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+NEWS_API_POOL_SIZE = int(os.getenv("NEWS_API_POOL_SIZE", 10))
+NEWS_API_MAX_RETRIES = 2
+NEWS_API_CACHE_ALIAS = "default"
+NEWS_API_CACHE_TTLS = {  # seconds
+    "top-headlines": 120,
+    "everything": 600,
+}
+NEWS_API_STALE_TTL = 900  # serve expired feeds this long while refreshing
+NEWS_API_FANOUT_TIMEOUT = 8  # overall deadline for concurrent sidebar fetches
+# Serve the news endpoints with async views (run under an ASGI server such as
+# uvicorn; requires httpx)
+NEWS_ASYNC_VIEWS = os.getenv("NEWS_ASYNC_VIEWS", "false").lower() == "true"
+NEWS_API_ASYNC_MAX_CONNECTIONS = 100
+NEWS_API_BUDGET = {
+    "daily_budget": int(os.getenv("NEWS_API_DAILY_BUDGET", 1000)),
+    "capacity": 20,  # burst size; must cover one ingest run (one call per feed)
+    "shared": True,  # also enforce the daily quota across processes via CACHES
+}
+NEWS_API_BREAKER = {
+    "failure_threshold": 3,  # consecutive 5xx/network errors before opening
+    "cooldown": 60,  # seconds; a 429's Retry-After takes precedence
+}
+
+# Local article store, filled by `python manage.py ingest_news --loop`.
+# Each ingest run makes one NewsAPI call per feed (18 feeds), so it costs
+# 18 * 86400 / NEWS_INGEST_INTERVAL calls a day: 432 at 3600 s. Keep that
+# within NEWS_INGEST_BUDGET_SHARE of NEWS_API_BUDGET["daily_budget"] (the rest
+# is left for live fallbacks and searches), and keep NEWS_STORE_MAX_AGE above
+# the interval so feeds don't expire just before they are refreshed.
+NEWS_STORE_ENABLED = True
+NEWS_STORE_MAX_AGE = 7200  # only serve feeds ingested within this many seconds
+NEWS_INGEST_INTERVAL = 3600
+NEWS_INGEST_BUDGET_SHARE = 0.5
+
+# UserActivity rows are buffered in memory and written in batches
+ACTIVITY_BUFFER_ENABLED = True
+ACTIVITY_BATCH_SIZE = 100
+ACTIVITY_FLUSH_INTERVAL = 2.0  # seconds
+ACTIVITY_MAX_QUEUE = 10000  # rows beyond this are dropped
+
+# High-volume activity types: count per user and hour instead of storing rows,
+# or keep only a fraction of rows. Login/logout/password events stay exact.
+ACTIVITY_ROLLUP_TYPES = ['DASHBOARD_VIEW']
+ACTIVITY_SAMPLE_RATES = {}  # e.g. {'PROFILE_UPDATE': 0.1}
+
+# `python manage.py archive_activity` moves older activity and login-session
+# rows into monthly gzip'd JSONL files; `read_archive` reads them back
+ACTIVITY_RETENTION_DAYS = 180
+ACTIVITY_ARCHIVE_DIR = BASE_DIR / 'archive'
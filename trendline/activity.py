@@ -0,0 +1,234 @@
+import atexit
+import logging
+import random
+import threading
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import ActivityRollup, UserActivity, UserAgent
+
+logger = logging.getLogger(__name__)
+
+# Always stored as exact rows, whatever the rollup/sampling settings say
+EXACT_ACTIVITY_TYPES = {
+    'LOGIN', 'LOGOUT', 'REGISTER', 'PASSWORD_CHANGE', 'PASSWORD_RESET', 'EMAIL_VERIFY',
+}
+
+
+class ActivityRecorder:
+    """
+    Write-behind logger for UserActivity rows.
+
+    ``record()`` only appends an unsaved row to an in-memory buffer; a
+    background thread writes the buffer with ``bulk_create`` once
+    ``batch_size`` rows are waiting or ``flush_interval`` seconds have
+    passed, so request handlers never wait on the database writer. The
+    buffer holds at most ``max_queue`` rows (extra rows are dropped and
+    counted) and is flushed when the process exits. With ``enabled=False``
+    every row is written immediately, as before.
+
+    High-volume types can be stored more cheaply: ``rollup_types`` are only
+    counted, into one ActivityRollup row per user, type and hour, and
+    ``sample_rates`` keeps just that fraction of rows for a type. Types in
+    EXACT_ACTIVITY_TYPES are never rolled up or sampled.
+    """
+
+    def __init__(self, enabled=True, batch_size=100, flush_interval=2.0, max_queue=10000,
+                 rollup_types=(), sample_rates=None):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.rollup_types = set(rollup_types) - EXACT_ACTIVITY_TYPES
+        self.sample_rates = {
+            activity_type: rate for activity_type, rate in (sample_rates or {}).items()
+            if activity_type not in EXACT_ACTIVITY_TYPES
+        }
+
+        self._buffer = deque()
+        self._rollups = Counter()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._stats = Counter()
+
+    def record(self, **fields):
+        """
+        Queue one UserActivity (same keyword arguments as objects.create,
+        except that ``user_agent`` is the raw User-Agent string)
+        """
+        user_agent = fields.pop('user_agent', '')
+        activity = UserActivity(**fields)
+
+        if activity.activity_type in self.rollup_types:
+            self._count_rollup(activity)
+            return
+
+        rate = self.sample_rates.get(activity.activity_type)
+        if rate is not None:
+            if random.random() >= rate:
+                self.count('sampled_out')
+                return
+            activity.metadata = {**(activity.metadata or {}), 'sample_rate': rate}
+
+        # Resolved on the request thread; almost always an in-process cache hit
+        activity.user_agent_id = UserAgent.id_for(user_agent)
+
+        if not self.enabled:
+            activity.save()
+            self.count('written')
+            return
+
+        with self._cond:
+            if len(self._buffer) >= self.max_queue:
+                self._stats['dropped'] += 1
+                return
+            self._buffer.append(activity)
+            self._stats['queued'] += 1
+            self._ensure_writer()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _count_rollup(self, activity):
+        hour = activity.timestamp.replace(minute=0, second=0, microsecond=0)
+        key = (activity.user_id, activity.activity_type, hour)
+
+        if not self.enabled:
+            self._write_rollups({key: 1})
+            return
+
+        with self._cond:
+            self._rollups[key] += 1
+            self._stats['rolled_up'] += 1
+            self._ensure_writer()
+
+    def count(self, name, amount=1):
+        with self._cond:
+            self._stats[name] += amount
+
+    def _ensure_writer(self):
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name='activity-writer', daemon=True,
+            )
+            self._thread.start()
+
+    def _take_batch(self):
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _take_rollups(self):
+        rollups, self._rollups = self._rollups, Counter()
+        return rollups
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take_batch()
+                rollups = self._take_rollups()
+                stopping = self._stopping and not self._buffer
+
+            if batch:
+                self._write(batch)
+            if rollups:
+                self._write_rollups(rollups)
+            if batch or rollups:
+                # The writer thread keeps its own connection; don't let it go stale.
+                # Only here: on a request thread this could close the request's
+                # connection, or one inside an atomic block.
+                close_old_connections()
+            if stopping:
+                return
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                UserActivity.objects.bulk_create(batch, batch_size=self.batch_size)
+                self.count('written', len(batch))
+                self.count('flushes')
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} user activities: {str(e)}")
+                self.count('failed', len(batch))
+
+    def _write_rollups(self, rollups):
+        """Add the counts to their hourly rows with one upsert per (user, type, hour)"""
+        table = connection.ops.quote_name(ActivityRollup._meta.db_table)
+        hour_field = ActivityRollup._meta.get_field('hour')
+        sql = (
+            f"INSERT INTO {table} (user_id, activity_type, hour, count) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT (user_id, activity_type, hour) "
+            f"DO UPDATE SET count = {table}.count + excluded.count"
+        )
+        params = [
+            (user_id, activity_type, hour_field.get_db_prep_value(hour, connection), count)
+            for (user_id, activity_type, hour), count in rollups.items()
+        ]
+
+        with self._write_lock:
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(sql, params)
+                self.count('rollup_rows', len(params))
+            except Exception as e:
+                logger.error(f"Failed to write {len(params)} activity rollups: {str(e)}")
+                self.count('failed', sum(rollups.values()))
+
+    def flush(self):
+        """Write everything buffered so far from the calling thread"""
+        with self._cond:
+            rollups = self._take_rollups()
+        if rollups:
+            self._write_rollups(rollups)
+
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5):
+        """Stop the writer thread and flush what is left (runs at exit)"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'buffered': len(self._buffer),
+                'queued': self._stats['queued'],
+                'written': self._stats['written'],
+                'dropped': self._stats['dropped'],
+                'failed': self._stats['failed'],
+                'flushes': self._stats['flushes'],
+                'sampled_out': self._stats['sampled_out'],
+                'rolled_up': self._stats['rolled_up'],
+                'rollup_rows': self._stats['rollup_rows'],
+                'pending_rollups': len(self._rollups),
+            }
+
+
+activity_recorder = ActivityRecorder(
+    enabled=getattr(settings, 'ACTIVITY_BUFFER_ENABLED', True),
+    batch_size=getattr(settings, 'ACTIVITY_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 2.0),
+    max_queue=getattr(settings, 'ACTIVITY_MAX_QUEUE', 10000),
+    rollup_types=getattr(settings, 'ACTIVITY_ROLLUP_TYPES', ()),
+    sample_rates=getattr(settings, 'ACTIVITY_SAMPLE_RATES', None),
+)
+atexit.register(activity_recorder.stop)
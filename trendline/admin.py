@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils import timezone
 from datetime import timedelta
-from .models import UserProfile, LoginSession, UserActivity, ChatConversation, ChatMessage
+from .models import UserProfile, LoginSession, UserActivity, ActivityRollup, ChatConversation, ChatMessage
 
 
 # Inline admin for UserProfile
@@ -160,7 +160,7 @@ class LoginSessionAdmin(admin.ModelAdmin):
     list_display = ('user', 'login_time', 'logout_time', 'ip_address', 'is_active', 'country', 'city')
     list_filter = ('is_active', 'login_time', 'country')
     search_fields = ('user__username', 'user__email', 'ip_address', 'country', 'city')
-    readonly_fields = ('login_time', 'duration')
+    readonly_fields = ('login_time', 'duration', 'user_agent')
     date_hierarchy = 'login_time'
     
     fieldsets = (
@@ -188,7 +188,7 @@ class UserActivityAdmin(admin.ModelAdmin):
     list_display = ('user', 'activity_type', 'timestamp', 'ip_address')
     list_filter = ('activity_type', 'timestamp')
     search_fields = ('user__username', 'user__email', 'description', 'ip_address')
-    readonly_fields = ('timestamp',)
+    readonly_fields = ('timestamp', 'user_agent')
     date_hierarchy = 'timestamp'
     
     fieldsets = (
@@ -205,6 +205,15 @@ class UserActivityAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ActivityRollup)
+class ActivityRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'activity_type', 'hour', 'count')
+    list_filter = ('activity_type', 'hour')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('user', 'activity_type', 'hour', 'count')
+    date_hierarchy = 'hour'
+
+
 # Customize admin site header and title
 admin.site.site_header = "User Management Admin"
 admin.site.site_title = "User Admin Portal"
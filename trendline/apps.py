@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models import CharField
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
 
 
 class TrendlineConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "trendline"
+
+    def ready(self):
+        # `email__lower=...` compiles to LOWER(email) = ..., matching the
+        # expression index on auth_user
+        CharField.register_lookup(Lower)
+
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='trendline.configure_sqlite')
+
+        # Drop cached profiles on writes that bypass the profile API
+        from .profiles import invalidate_on_profile_change, invalidate_on_user_change
+        post_save.connect(invalidate_on_profile_change, sender='trendline.UserProfile',
+                          dispatch_uid='trendline.invalidate_profile_on_save')
+        post_delete.connect(invalidate_on_profile_change, sender='trendline.UserProfile',
+                            dispatch_uid='trendline.invalidate_profile_on_delete')
+        post_save.connect(invalidate_on_user_change, sender='auth.User',
+                          dispatch_uid='trendline.invalidate_profile_on_user_save')
@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import LoginSession, UserActivity
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# kind -> (model, date field, columns written to the archive)
+ARCHIVES = {
+    'activity': (UserActivity, 'timestamp', [
+        'id', 'user_id', 'user__username', 'activity_type', 'description', 'timestamp',
+        'ip_address', 'user_agent__value', 'metadata',
+    ]),
+    'sessions': (LoginSession, 'login_time', [
+        'id', 'user_id', 'user__username', 'login_time', 'logout_time', 'ip_address',
+        'user_agent__value', 'session_key', 'is_active', 'country', 'city',
+    ]),
+}
+
+
+def archive_dir():
+    return Path(getattr(settings, 'ACTIVITY_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+
+
+def archive_path(kind, month, directory=None):
+    """Monthly archive file, e.g. archive/activity/2026-01.jsonl.gz"""
+    return Path(directory or archive_dir()) / kind / f"{month}.jsonl.gz"
+
+
+def archive_rows(kind, before, directory=None, batch_size=ARCHIVE_BATCH_SIZE, pause=0):
+    """
+    Move rows older than ``before`` into monthly gzip'd JSONL files.
+
+    Rows are handled in primary-key batches: each batch is appended to its
+    month's file (and flushed to disk) before the same rows are deleted in a
+    short transaction, so the write lock is only held for one small DELETE
+    at a time and an interrupted run loses nothing. ``pause`` sleeps
+    between batches to give other writers a turn. Returns the row count.
+
+    Rows are read from the primary: a replica would keep returning the
+    batch that was just deleted.
+    """
+    model, date_field, columns = ARCHIVES[kind]
+    queryset = model.objects.using('default').filter(**{f'{date_field}__lt': before}).order_by('pk')
+    total = 0
+
+    while True:
+        rows = list(queryset.values(*columns)[:batch_size])
+        if not rows:
+            return total
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row[date_field].strftime('%Y-%m')].append(row)
+        for month, month_rows in by_month.items():
+            _append(archive_path(kind, month, directory), month_rows)
+
+        with transaction.atomic():
+            model.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+        total += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def _append(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+    # Each call adds a gzip member; gzip.open reads them back as one stream
+    with open(path, 'ab') as raw:
+        raw.write(gzip.compress(data.encode('utf-8')))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archived_months(kind, directory=None):
+    folder = Path(directory or archive_dir()) / kind
+    return sorted(path.name[:-len('.jsonl.gz')] for path in folder.glob('*.jsonl.gz'))
+
+
+def read_archive(kind, month, directory=None, username=None, activity_type=None):
+    """Yield archived rows for one month, optionally filtered by user or activity type"""
+    path = archive_path(kind, month, directory)
+    if not path.exists():
+        return
+
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            row = json.loads(line)
+            if username and row.get('user__username') != username:
+                continue
+            if activity_type and row.get('activity_type') != activity_type:
+                continue
+            yield row
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+import weakref
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .news_client import news_client
+
+try:
+    import httpx
+except ImportError:  # httpx is only needed for the async (ASGI) views
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class _LoopState:
+    """HTTP client and in-flight fetches belonging to one event loop"""
+
+    def __init__(self, http):
+        self.http = http
+        self.inflight = {}
+
+
+class AsyncNewsAPIClient:
+    """
+    Async counterpart of NewsAPIClient for the ASGI views.
+
+    Uses a shared ``httpx.AsyncClient`` for upstream calls but reuses the sync
+    client's cache, request budget, circuit breaker and statistics, so both
+    paths see the same cached payloads and the same upstream limits.
+    Network errors are re-raised as ``requests`` exceptions so callers can
+    handle both clients the same way.
+    """
+
+    def __init__(self, client, max_connections=100):
+        self.client = client
+        self.max_connections = max_connections
+        # One httpx client per event loop: under uvicorn that is one per
+        # worker, but Django runs async views on WSGI in throwaway loops
+        self._loops = weakref.WeakKeyDictionary()
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = _LoopState(self._build_http())
+            self._loops[loop] = state
+        return state
+
+    def _build_http(self):
+        if httpx is None:
+            raise ImproperlyConfigured("The async news views require httpx (pip install httpx)")
+
+        connect_timeout, read_timeout = self.client.timeout
+        return httpx.AsyncClient(
+            base_url=self.client.base_url,
+            headers={
+                'X-Api-Key': self.client.api_key,
+                'User-Agent': 'TrendLine/1.0',
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.client.pool_size,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=self.client.max_retries),
+        )
+
+    async def request(self, endpoint, params=None):
+        """GET an endpoint and return the httpx response"""
+        self.client.require_api_key()
+        params = self.client.clean_params(params)
+        self.client.before_request()
+
+        try:
+            response = await self._state().http.get(f"/{endpoint.strip('/')}", params=params)
+        except httpx.TimeoutException as e:
+            error = requests.Timeout(str(e))
+            self.client.after_error(error)
+            raise error from e
+        except httpx.HTTPError as e:
+            error = requests.ConnectionError(str(e))
+            self.client.after_error(error)
+            raise error from e
+
+        self.client.after_response(response.status_code, response.headers)
+        return response
+
+    async def get_json(self, endpoint, params=None):
+        return (await self.request(endpoint, params)).json()
+
+    async def fetch(self, endpoint, params=None, ttl=None):
+        """Cached fetch with the same stale-while-revalidate rules as NewsAPIClient.fetch"""
+        client = self.client
+        params = client.clean_params(params)
+        key = client.cache_key(endpoint, params)
+        ttl = client.ttl_for(endpoint) if ttl is None else ttl
+
+        entry = await client.cache.aget(key)
+        if entry is not None:
+            client.count('cache_hits')
+            if entry['expires_at'] <= time.time():
+                client.count('stale_hits')
+                if client.breaker is None or not client.breaker.is_open:
+                    self._start_load(endpoint, params, key, ttl, refresh=True)
+            return entry['data']
+
+        client.count('cache_misses')
+        state = self._state()
+        if key in state.inflight:
+            client.count('coalesced')
+            return await asyncio.shield(state.inflight[key])
+        return await asyncio.shield(self._start_load(endpoint, params, key, ttl))
+
+    def _start_load(self, endpoint, params, key, ttl, refresh=False):
+        """Start (or join) the single in-flight upstream fetch for a key"""
+        state = self._state()
+        task = state.inflight.get(key)
+        if task is not None:
+            return task
+
+        async def load():
+            if refresh:
+                self.client.count('refreshes')
+            data = await self.get_json(endpoint, params)
+            await self.client.astore(key, data, ttl)
+            return data
+
+        def done(finished):
+            state.inflight.pop(key, None)
+            if refresh and not finished.cancelled() and finished.exception() is not None:
+                logger.warning(f"Background refresh failed for {endpoint}: {finished.exception()}")
+
+        task = asyncio.ensure_future(load())
+        task.add_done_callback(done)
+        state.inflight[key] = task
+        return task
+
+    async def fetch_many(self, calls, timeout=None):
+        """Async version of NewsAPIClient.fetch_many"""
+        tasks = {
+            name: asyncio.ensure_future(self.fetch(endpoint, params))
+            for name, (endpoint, params) in calls.items()
+        }
+        if not tasks:
+            return {}
+        done, _ = await asyncio.wait(tasks.values(), timeout=timeout or self.client.fanout_timeout)
+
+        results = {}
+        for name, task in tasks.items():
+            if task not in done:
+                logger.warning(f"NewsAPI fetch '{name}' missed the fan-out deadline")
+                # Let it finish in the background without an unretrieved-exception warning
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                results[name] = None
+            elif task.exception() is not None:
+                logger.warning(f"NewsAPI fetch '{name}' failed: {task.exception()}")
+                results[name] = None
+            else:
+                results[name] = task.result()
+        return results
+
+
+async_news_client = AsyncNewsAPIClient(
+    news_client,
+    max_connections=getattr(settings, 'NEWS_API_ASYNC_MAX_CONNECTIONS', 100),
+)
@@ -0,0 +1,201 @@
+"""
+Async (ASGI) versions of the news API views.
+
+They share request building and response formatting with ``views`` but wait
+on NewsAPI through the shared ``httpx.AsyncClient``, so one ASGI worker can
+hold many upstream waits at once instead of blocking a thread per request.
+Enabled in ``urls.py`` with the NEWS_ASYNC_VIEWS setting.
+"""
+import json
+import logging
+
+import requests
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from .async_news_client import async_news_client
+from .feeds import feed_request, search_payload, stored_payload
+from . import views
+from .views import (
+    SIDEBAR_FALLBACK, _needs_fallback, _recent_items, _sidebar_calls,
+    _sidebar_error, _sidebar_response, _trending_items,
+)
+
+logger = logging.getLogger(__name__)
+
+# Local article store lookups use the ORM, which must run outside the event loop
+astored_payload = sync_to_async(stored_payload)
+asearch_payload = sync_to_async(search_payload)
+
+
+async def get_news(request, category):
+    search_query = request.GET.get("q", "").strip()
+
+    # Answer searches from the local full-text index across all ingested articles
+    if search_query:
+        data = await asearch_payload(search_query, tag=None if category == "all" else category)
+        if data is not None:
+            return JsonResponse(data)
+
+    data = await astored_payload(category)
+    if data is None:
+        endpoint, params = feed_request(category)
+        try:
+            data = await async_news_client.fetch(endpoint, params)
+        except requests.RequestException as e:
+            logger.warning(f"News for '{category}' unavailable: {e}")
+            return JsonResponse({"status": "error", "message": str(e), "totalResults": 0, "articles": []})
+    articles = data.get("articles", [])
+
+    if search_query:
+        articles = [a for a in articles if search_query.lower() in (a.get("title") or "").lower()]
+
+    return JsonResponse({"status": "ok", "totalResults": len(articles), "articles": articles})
+
+
+async def get_trending_news(request):
+    """Get trending news using popularity and recent timeframe"""
+    try:
+        data = await astored_payload('trending-wide')
+
+        if data is None:
+            endpoint, params = feed_request('trending-wide')
+            data = await async_news_client.fetch(endpoint, params)
+
+        return JsonResponse({
+            "status": "ok",
+            "trending": _trending_items(data)
+        })
+
+    except requests.RequestException as e:
+        return JsonResponse({"status": "error", "message": str(e)})
+
+
+async def get_recent_news(request):
+    """Get news from past 10 days for sidebar"""
+    try:
+        data = await astored_payload('recent-india')
+
+        if data is None:
+            endpoint, params = feed_request('recent-india')
+            data = await async_news_client.fetch(endpoint, params)
+
+        return JsonResponse({
+            "status": "ok",
+            "recent": _recent_items(data)
+        })
+
+    except requests.RequestException as e:
+        return JsonResponse({"status": "error", "message": str(e)})
+
+
+async def get_sidebar_data(request):
+    """Combined endpoint for both trending and recent news"""
+    try:
+        results = {
+            'trending': await astored_payload('trending'),
+            'recent': await astored_payload('recent'),
+        }
+        results.update(await async_news_client.fetch_many(_sidebar_calls(results)))
+        if _needs_fallback(results):
+            results.update(await async_news_client.fetch_many(SIDEBAR_FALLBACK))
+
+        return _sidebar_response(results)
+
+    except Exception as e:
+        return _sidebar_error(e)
+
+
+class NewsChatView(views.NewsChatView):
+    """
+    News Chat API View awaiting NewsAPI instead of blocking a thread
+    """
+
+    async def post(self, request):
+        try:
+            # Parse the JSON request
+            data = json.loads(request.body)
+            user_message = data.get('message', '').strip()
+
+            logger.info(f"Received message: {user_message}")
+
+            if not user_message:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'No message provided'
+                })
+
+            # Cached and stored news is served even while NewsAPI is down;
+            # upstream health is only reported when nothing could answer
+            response = await self.generate_news_response(user_message)
+
+            return JsonResponse({
+                'status': 'success',
+                'bot_response': response
+            })
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e}")
+            return JsonResponse({
+                'status': 'error',
+                'message': f'Invalid JSON data: {str(e)}'
+            })
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return JsonResponse({
+                'status': 'error',
+                'message': f'An error occurred: {str(e)}'
+            })
+
+    async def generate_news_response(self, user_message):
+        logger.info(f"Processing message: {user_message}")
+
+        action, args = self.route_message(user_message)
+        if action == 'greeting':
+            return self.GREETING
+        if action == 'trending':
+            return await self.get_trending_news()
+        return await self.search_news(*args)
+
+    async def get_trending_news(self):
+        try:
+            data = await async_news_client.fetch('top-headlines', self.trending_params())
+            return self.trending_response(data)
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Request error: {e}")
+            return self.upstream_error("🔌 **Connection Error**: Could not fetch news. Please try again.")
+        except Exception as e:
+            logger.error(f"Unexpected error in get_trending_news: {e}")
+            return f"⚠️ **Unexpected Error**: {str(e)}"
+
+    async def search_news(self, query, category=None):
+        try:
+            logger.info(f"Searching for: {query}, category: {category}")
+
+            # Try top headlines first if category is specified
+            if category:
+                try:
+                    data = await async_news_client.fetch('top-headlines', self.category_params(category))
+
+                    if data['status'] == 'ok' and data['articles']:
+                        return self.format_news_response(data['articles'], f"📰 **{category.title()} News**")
+
+                except Exception as e:
+                    logger.warning(f"Category search failed, falling back to general search: {e}")
+
+            # Otherwise answer from the local article index when possible
+            local = await asearch_payload(query, limit=5, match_all=False)
+            if local is not None:
+                return self.format_news_response(local['articles'], f"🔍 **Search Results for: {query}**")
+
+            # General search fallback
+            data = await async_news_client.fetch('everything', self.search_params(query))
+            return self.search_response(data, query)
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Search request error: {e}")
+            return self.upstream_error("🔌 **Search Error**: Could not fetch news. Please try again.")
+        except Exception as e:
+            logger.error(f"Unexpected search error: {e}")
+            return f"⚠️ **Search Error**: {str(e)}"
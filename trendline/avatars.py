@@ -0,0 +1,208 @@
+import atexit
+import logging
+import queue
+import threading
+import uuid
+from collections import Counter
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import UserProfile
+from .profiles import invalidate_profile
+
+logger = logging.getLogger(__name__)
+
+AVATAR_MAX_DIMENSION = getattr(settings, 'AVATAR_MAX_DIMENSION', 1024)
+AVATAR_THUMBNAIL_SIZES = sorted(getattr(settings, 'AVATAR_THUMBNAIL_SIZES', [64, 128, 256]))
+AVATAR_QUALITY = getattr(settings, 'AVATAR_QUALITY', 82)
+# Refuse to decode anything bigger than this (decompression bombs)
+AVATAR_MAX_PIXELS = getattr(settings, 'AVATAR_MAX_PIXELS', 40_000_000)
+
+
+class InvalidAvatar(ValueError):
+    """The upload isn't an image Pillow can read, or is too large to decode"""
+
+
+def avatar_format():
+    """WebP when this Pillow build can write it, otherwise JPEG"""
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+
+    buffer = BytesIO()
+    if image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=AVATAR_QUALITY, method=4)
+    else:
+        image.save(buffer, 'JPEG', quality=AVATAR_QUALITY, optimize=True, progressive=True)
+    # No exif/icc arguments are passed, so no metadata is written
+    return buffer.getvalue()
+
+
+def normalize_avatar(upload):
+    """
+    Re-encode an uploaded image: apply and drop its EXIF orientation (and
+    all other metadata), cap the longest side at AVATAR_MAX_DIMENSION and
+    save it as WebP/JPEG under a fresh name. Returns a ContentFile ready for
+    ``profile.avatar.save()``; raises InvalidAvatar for anything else.
+    """
+    try:
+        image = Image.open(upload)
+        if image.width * image.height > AVATAR_MAX_PIXELS:
+            raise InvalidAvatar(f"Image is too large ({image.width}x{image.height})")
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, which is much cheaper
+        image.draft('RGB', (AVATAR_MAX_DIMENSION, AVATAR_MAX_DIMENSION))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidAvatar(str(e)) from e
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.thumbnail((AVATAR_MAX_DIMENSION, AVATAR_MAX_DIMENSION), Image.LANCZOS)
+
+    image_format = avatar_format()
+    extension = 'webp' if image_format == 'WEBP' else 'jpg'
+    return ContentFile(_encode(image, image_format), name=f"{uuid.uuid4().hex}.{extension}")
+
+
+def generate_thumbnails(name, storage, sizes=AVATAR_THUMBNAIL_SIZES):
+    """Write square thumbnails of a stored avatar next to it; returns the sizes made"""
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+
+    image_format = 'WEBP' if name.endswith('.webp') else 'JPEG'
+    made = []
+    for size in sizes:
+        if size > max(image.size) and made:
+            break  # Don't upscale beyond the first thumbnail
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        variant = UserProfile.avatar_variant_name(name, size)
+        if storage.exists(variant):
+            storage.delete(variant)
+        storage.save(variant, ContentFile(_encode(thumbnail, image_format)))
+        made.append(size)
+    return made
+
+
+def delete_avatar_files(name, storage, sizes):
+    """Remove a replaced avatar and its thumbnails"""
+    for variant in [name] + [UserProfile.avatar_variant_name(name, size) for size in sizes]:
+        try:
+            storage.delete(variant)
+        except OSError as e:
+            logger.warning(f"Could not delete old avatar file {variant}: {str(e)}")
+
+
+class AvatarProcessor:
+    """
+    Background worker that makes avatar thumbnails.
+
+    ``submit()`` queues a profile's new avatar once the current transaction
+    commits; a daemon thread generates the thumbnails, records their sizes
+    on the profile (only if that avatar is still the current one), refreshes
+    the cached profile and deletes the avatar it replaced. With
+    ``enabled=False`` the work runs inline on commit instead.
+    """
+
+    def __init__(self, enabled=True, max_queue=1000):
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = Counter()
+
+    def submit(self, profile, old_name=None, old_sizes=()):
+        job = (profile.pk, profile.user_id, profile.avatar.name, old_name, list(old_sizes))
+        transaction.on_commit(lambda: self._enqueue(job))
+
+    def _enqueue(self, job):
+        if not self.enabled:
+            self.process(*job)
+            return
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # The backfill command picks up avatars left without thumbnails
+            logger.warning(f"Avatar queue full; thumbnails for profile {job[0]} skipped")
+            self.count('dropped')
+            return
+        self.count('queued')
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='avatar-processor', daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self.process(*job)
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    def process(self, profile_id, user_id, name, old_name=None, old_sizes=()):
+        storage = UserProfile._meta.get_field('avatar').storage
+        try:
+            sizes = generate_thumbnails(name, storage)
+        except Exception as e:
+            logger.error(f"Failed to make thumbnails for {name}: {str(e)}")
+            self.count('failed')
+            return
+
+        updated = UserProfile.objects.filter(pk=profile_id, avatar=name).update(avatar_sizes=sizes)
+        if updated:
+            invalidate_profile(user_id)
+        else:
+            # Replaced again while we were working; the newer job owns the profile
+            delete_avatar_files(name, storage, sizes)
+        if old_name:
+            delete_avatar_files(old_name, storage, old_sizes)
+        self.count('processed')
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stop(self, timeout=10):
+        """Finish queued jobs (runs at exit)"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'pending': self._queue.qsize(),
+                'queued': self._stats['queued'],
+                'processed': self._stats['processed'],
+                'failed': self._stats['failed'],
+                'dropped': self._stats['dropped'],
+            }
+
+
+avatar_processor = AvatarProcessor(
+    enabled=getattr(settings, 'AVATAR_ASYNC_THUMBNAILS', True),
+)
+atexit.register(avatar_processor.stop)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, IntegerField, Q, Value, When
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticate with either a username or an email address.
+
+    The user is resolved with a single query (an exact username match wins
+    over a case-insensitive email match, which uses the LOWER(email) index)
+    and the password is checked once, so a login costs one password hash
+    instead of one per lookup attempt.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = self.candidates(username).first()
+        if user is None:
+            # Run the hasher anyway so unknown accounts take as long as known ones
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def candidates(self, username):
+        """Accounts matching a username or email, the exact username match first"""
+        UserModel = get_user_model()
+        return (
+            UserModel._default_manager
+            .filter(Q(**{UserModel.USERNAME_FIELD: username}) | Q(email__lower=username.lower()))
+            .annotate(username_match=Case(
+                When(**{UserModel.USERNAME_FIELD: username}, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ))
+            .order_by('username_match', 'pk')
+            # login_view checks the profile right after; load it in the same query
+            .select_related('userprofile')
+        )
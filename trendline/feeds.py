@@ -0,0 +1,274 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Article, ArticleTag
+from .news_client import news_client
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 500
+
+# Words ignored when turning a free-text chat message into a search query
+SEARCH_STOPWORDS = {
+    'a', 'about', 'an', 'and', 'any', 'are', 'for', 'from', 'give', 'in', 'is',
+    'latest', 'me', 'news', 'of', 'on', 'or', 'show', 'tell', 'the', 'to',
+    'today', 'update', 'updates', 'what', 'whats', 'with',
+}
+
+# Columns refreshed when an already-stored article is ingested again
+ARTICLE_UPDATE_FIELDS = [
+    'url', 'title', 'description', 'content', 'author', 'source',
+    'url_to_image', 'published_at', 'fetched_at',
+]
+
+# Search queries behind each dashboard category
+CATEGORY_QUERIES = {
+    "politics": "India politics government",
+    "bollywood": "India bollywood entertainment movies",
+    "sports": "India sports cricket football",
+    "technology": "India technology gadgets innovation",
+    "business": "India business economy finance",
+    "health": "India health medicine covid",
+    "international": "world news global international relations",
+    "science": "science research space ISRO NASA discovery",
+    "environment": "India environment climate change pollution",
+    "education": "India education schools universities students",
+    "lifestyle": "India lifestyle fashion food travel culture",
+}
+
+
+# Feeds behind the standalone trending, recent and advanced trending endpoints;
+# the sidebar uses the plain 'trending' and 'recent' feeds
+ENDPOINT_FEEDS = ['trending-wide', 'recent-india', 'advanced-popular', 'advanced-keyword']
+
+
+def _days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def feed_request(name):
+    """
+    Return the (endpoint, params) NewsAPI call behind a named feed.
+
+    The ingest worker and the views' live fallbacks both build their calls
+    here, so a feed served from the store matches what NewsAPI would return.
+    """
+    if name == 'all':
+        return 'top-headlines', {'country': 'in'}
+    if name == 'trending':
+        return 'everything', {
+            'q': "India trending OR viral OR popular",
+            'language': 'en',
+            'from': _days_ago(3),
+            'sortBy': 'popularity',
+            'pageSize': 10,
+        }
+    if name == 'trending-wide':
+        return 'everything', {
+            'q': "India trending OR viral OR popular OR breaking OR major",
+            'language': 'en',
+            'from': _days_ago(3),
+            'sortBy': 'popularity',
+            'pageSize': 15,
+        }
+    if name == 'recent':
+        return 'top-headlines', {'country': 'in', 'pageSize': 10}
+    if name == 'recent-india':
+        return 'everything', {
+            'q': "India",
+            'from': _days_ago(10),
+            'to': datetime.now().strftime('%Y-%m-%d'),
+            'sortBy': 'publishedAt',
+            'language': 'en',
+            'pageSize': 15,
+        }
+    if name == 'advanced-popular':
+        return 'everything', {
+            'language': 'en',
+            'from': _days_ago(2),
+            'sortBy': 'popularity',
+            'pageSize': 8,
+        }
+    if name == 'advanced-keyword':
+        return 'everything', {
+            'q': "trending OR viral OR breaking OR major OR important",
+            'language': 'en',
+            'from': _days_ago(2),
+            'sortBy': 'popularity',
+            'pageSize': 6,
+        }
+    return 'everything', {
+        'q': CATEGORY_QUERIES.get(name, "India"),
+        'sortBy': 'publishedAt',
+        'language': 'en',
+    }
+
+
+def feed_names():
+    return ['all', 'trending', 'recent'] + ENDPOINT_FEEDS + list(CATEGORY_QUERIES)
+
+
+def store_articles(articles, tag):
+    """
+    Upsert NewsAPI articles into the local store and tag them with a feed name.
+
+    The whole batch is written with two bulk upserts (articles by url_hash,
+    then tags) plus one SELECT for the article ids, inside one transaction.
+    """
+    now = timezone.now()
+    rows = {}
+
+    for item in articles:
+        url = item.get('url')
+        title = item.get('title')
+        if not url or not title or title == '[Removed]':
+            continue
+
+        url_hash = Article.hash_url(url)
+        rows[url_hash] = Article(
+            url_hash=url_hash,
+            url=url,
+            title=title[:500],
+            description=item.get('description') or '',
+            content=item.get('content') or '',
+            author=(item.get('author') or '')[:255],
+            source=((item.get('source') or {}).get('name') or '')[:255],
+            url_to_image=item.get('urlToImage') or '',
+            published_at=parse_datetime(item.get('publishedAt') or ''),
+        )
+
+    if not rows:
+        return 0
+
+    with transaction.atomic():
+        Article.objects.bulk_create(
+            rows.values(),
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['url_hash'],
+            update_fields=ARTICLE_UPDATE_FIELDS,
+        )
+        # SQLite does not return ids from an upsert, so look them up in one query
+        ids = dict(
+            Article.objects.filter(url_hash__in=list(rows)).values_list('url_hash', 'id')
+        )
+        ArticleTag.objects.bulk_create(
+            [ArticleTag(article_id=ids[url_hash], name=tag, seen_at=now) for url_hash in rows],
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['article', 'name'],
+            update_fields=['seen_at'],
+        )
+
+    return len(rows)
+
+
+def ingest_feed(name):
+    """Fetch one feed from NewsAPI and store its articles; returns the count stored"""
+    endpoint, params = feed_request(name)
+    data = news_client.get_json(endpoint, params)
+
+    if data.get('status') != 'ok':
+        logger.warning(f"Ingest of '{name}' failed: {data.get('message', 'unknown error')}")
+        return 0
+
+    return store_articles(data.get('articles', []), name)
+
+
+def ingest_all(names=None):
+    """Ingest every feed (or the given ones) and return {feed: count}"""
+    results = {}
+    for name in names or feed_names():
+        try:
+            results[name] = ingest_feed(name)
+        except Exception as e:
+            logger.error(f"Error ingesting feed '{name}': {str(e)}")
+            results[name] = 0
+    return results
+
+
+def stored_payload(name, limit=20):
+    """
+    Return a NewsAPI-shaped payload for a feed from the local store, or None if
+    the feed has not been ingested recently enough to serve.
+    """
+    if not getattr(settings, 'NEWS_STORE_ENABLED', True):
+        return None
+
+    max_age = getattr(settings, 'NEWS_STORE_MAX_AGE', 3600)
+    since = timezone.now() - timedelta(seconds=max_age)
+
+    articles = list(
+        Article.objects
+        .filter(tags__name=name, tags__seen_at__gte=since)
+        .order_by('-published_at')[:limit]
+    )
+    if not articles:
+        return None
+
+    return _articles_payload(articles)
+
+
+def _articles_payload(articles):
+    return {
+        'status': 'ok',
+        'totalResults': len(articles),
+        'articles': [article.as_api_dict() for article in articles],
+    }
+
+
+def build_match_query(text, match_all=True):
+    """Turn free text into a safe FTS5 MATCH expression (or '' if nothing to search)"""
+    terms = [term for term in re.findall(r'\w+', text.lower()) if len(term) > 1]
+    if not match_all:
+        terms = [term for term in terms if term not in SEARCH_STOPWORDS]
+    if not terms:
+        return ''
+    # Quote every term so user input can never be parsed as FTS syntax
+    return (' AND ' if match_all else ' OR ').join(f'"{term}"' for term in terms)
+
+
+def search_articles(text, tag=None, limit=20, match_all=True):
+    """
+    Full-text search over stored articles, best matches first.
+
+    Uses the SQLite FTS5 index (BM25, title weighted highest); other
+    databases fall back to a title substring match.
+    """
+    if connection.vendor != 'sqlite':
+        queryset = Article.objects.filter(title__icontains=text.strip())
+        if tag:
+            queryset = queryset.filter(tags__name=tag)
+        return list(queryset.order_by('-published_at')[:limit])
+
+    match = build_match_query(text, match_all=match_all)
+    if not match:
+        return []
+
+    sql = """
+        SELECT a.* FROM trendline_article_fts
+        JOIN trendline_article a ON a.id = trendline_article_fts.rowid
+        WHERE trendline_article_fts MATCH %s
+    """
+    params = [match]
+    if tag:
+        sql += " AND a.id IN (SELECT article_id FROM trendline_articletag WHERE name = %s)"
+        params.append(tag)
+    sql += " ORDER BY bm25(trendline_article_fts, 10.0, 3.0, 1.0), a.published_at DESC LIMIT %s"
+    params.append(limit)
+
+    return list(Article.objects.raw(sql, params))
+
+
+def search_payload(text, tag=None, limit=20, match_all=True):
+    """NewsAPI-shaped search results from the local store, or None if nothing matched"""
+    if not getattr(settings, 'NEWS_STORE_ENABLED', True):
+        return None
+    articles = search_articles(text, tag=tag, limit=limit, match_all=match_all)
+    return _articles_payload(articles) if articles else None
@@ -130,7 +130,8 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        # Case-insensitive, served by the LOWER(email) index on auth_user
+        if User.objects.filter(email__lower=email.lower()).exists():
             raise forms.ValidationError('This email is already registered.')
         return email
     
@@ -165,25 +166,13 @@ class CustomAuthenticationForm(AuthenticationForm):
         password = self.cleaned_data.get('password')
         
         if username and password:
-            # Try to authenticate with username first
+            # EmailOrUsernameBackend accepts either, checking the password once
             self.user_cache = authenticate(
                 self.request, 
                 username=username, 
                 password=password
             )
             
-            # If that fails, try with email
-            if self.user_cache is None:
-                try:
-                    user = User.objects.get(email=username)
-                    self.user_cache = authenticate(
-                        self.request,
-                        username=user.username,
-                        password=password
-                    )
-                except User.DoesNotExist:
-                    pass
-            
             if self.user_cache is None:
                 raise forms.ValidationError(
                     "Invalid username/email or password.",
@@ -234,7 +223,7 @@ class LoginSessionForm(forms.ModelForm):
     
     class Meta:
         model = LoginSession
-        fields = ['user', 'ip_address', 'user_agent', 'country', 'city', 'is_active']
+        fields = ['user', 'ip_address', 'country', 'city', 'is_active']
         widgets = {
             'user': forms.Select(attrs={
                 'class': 'form-control'
@@ -243,10 +232,6 @@ class LoginSessionForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': '192.168.1.1'
             }),
-            'user_agent': forms.Textarea(attrs={
-                'class': 'form-control',
-                'rows': 3
-            }),
             'country': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Country'
@@ -263,7 +248,7 @@ class UserActivityForm(forms.ModelForm):
     
     class Meta:
         model = UserActivity
-        fields = ['user', 'activity_type', 'description', 'ip_address', 'user_agent', 'metadata']
+        fields = ['user', 'activity_type', 'description', 'ip_address', 'metadata']
         widgets = {
             'user': forms.Select(attrs={
                 'class': 'form-control'
@@ -280,10 +265,6 @@ class UserActivityForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': '192.168.1.1'
             }),
-            'user_agent': forms.Textarea(attrs={
-                'class': 'form-control',
-                'rows': 2
-            }),
             'metadata': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from trendline.archive import ARCHIVE_BATCH_SIZE, ARCHIVES, archive_dir, archive_rows
+
+
+class Command(BaseCommand):
+    help = 'Move old UserActivity and LoginSession rows into monthly gzip archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*',
+            help='What to archive (default: activity and sessions)',
+        )
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'ACTIVITY_RETENTION_DAYS', 180),
+            help='Archive rows older than this many days',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help='Rows archived and deleted per transaction',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches',
+        )
+        parser.add_argument(
+            '--dir', default=None,
+            help='Archive directory (default: ACTIVITY_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows would be archived',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        directory = options['dir'] or archive_dir()
+        kinds = options['kinds'] or list(ARCHIVES)
+        unknown = set(kinds) - set(ARCHIVES)
+        if unknown:
+            raise CommandError(f"Unknown archive(s): {', '.join(sorted(unknown))}")
+
+        for kind in kinds:
+            model, date_field, _ = ARCHIVES[kind]
+
+            if options['dry_run']:
+                count = model.objects.using('default').filter(**{f'{date_field}__lt': before}).count()
+                self.stdout.write(f"{kind}: {count} rows older than {before:%Y-%m-%d} would be archived")
+                continue
+
+            count = archive_rows(
+                kind, before, directory,
+                batch_size=options['batch_size'], pause=options['pause'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: archived {count} rows older than {before:%Y-%m-%d} to {directory}"
+            ))
@@ -0,0 +1,66 @@
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from trendline.activity import activity_recorder
+
+BENCH_USERNAME = 'login-benchmark'
+BENCH_EMAIL = 'Login-Benchmark@example.com'
+BENCH_PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the CPU cost of POST /login/ (and how many password hashes each '
+        'login runs) for username, email, wrong-password and unknown-user logins'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', '-n', type=int, default=20, help='Logins per case')
+
+    def handle(self, *args, **options):
+        if options['logins'] < 1:
+            raise CommandError("--logins must be positive")
+
+        cases = [
+            ('username', BENCH_USERNAME, BENCH_PASSWORD),
+            ('email', BENCH_EMAIL.lower(), BENCH_PASSWORD),
+            ('wrong password', BENCH_USERNAME, 'not-the-password'),
+            ('unknown user', 'nobody@example.com', BENCH_PASSWORD),
+        ]
+
+        # Everything the logins write (user, sessions, activity) is rolled back;
+        # activity is written inline so none of it escapes the transaction
+        with override_settings(ALLOWED_HOSTS=['testserver']), \
+                mock.patch.object(activity_recorder, 'enabled', False), \
+                transaction.atomic():
+            User.objects.create_user(BENCH_USERNAME, BENCH_EMAIL, BENCH_PASSWORD)
+            for label, username, password in cases:
+                cpu, hashes = self.measure(username, password, options['logins'])
+                self.stdout.write(
+                    f"{label:>14}: {statistics.mean(cpu) * 1000:6.0f} ms CPU  "
+                    f"(p50 {statistics.median(cpu) * 1000:.0f} ms, max {max(cpu) * 1000:.0f} ms), "
+                    f"{hashes / options['logins']:.0f} PBKDF2 run(s) per login"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['logins']} logins per case with {hashers.get_hasher().algorithm}"
+        ))
+
+    def measure(self, username, password, logins):
+        """process_time per login and the total number of key derivations"""
+        cpu = []
+        with mock.patch('django.contrib.auth.hashers.pbkdf2', wraps=hashers.pbkdf2) as pbkdf2:
+            for _ in range(logins):
+                client = Client()
+                started = time.process_time()
+                client.post('/login/', {'username': username, 'password': password})
+                cpu.append(time.process_time() - started)
+        return cpu, pbkdf2.call_count
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections, transaction
+
+from trendline.models import LoginSession, UserActivity
+
+# What the database settings were before WAL: rollback journal, a new
+# connection per request, deferred transactions and sqlite3's 5 s timeout
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE'}
+
+
+def _request(work):
+    """Run one unit of work the way a request does, counting lock errors"""
+    close_old_connections()  # request_started
+    try:
+        work()
+        return True
+    except OperationalError as e:
+        if 'locked' not in str(e):
+            raise
+        return False
+    finally:
+        close_old_connections()  # request_finished
+
+
+def _worker(role, user_id, deadline, results):
+    ok = failed = 0
+
+    def write():
+        with transaction.atomic():
+            LoginSession.objects.create(user_id=user_id, session_key=uuid.uuid4().hex)
+            UserActivity.objects.create(user_id=user_id, activity_type='LOGIN')
+
+    def read():
+        # The user timeline and the logout lookup
+        list(UserActivity.objects.filter(user_id=user_id).order_by('-timestamp')[:20])
+        LoginSession.objects.filter(user_id=user_id, session_key=uuid.uuid4().hex, is_active=True).exists()
+
+    work = write if role == 'writer' else read
+    while time.monotonic() < deadline:
+        if _request(work):
+            ok += 1
+        else:
+            failed += 1
+    connections.close_all()
+    results.put((role, ok, failed))
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent SQLite throughput with one process per simulated worker, '
+        'on a scratch database (the configured one is never touched)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help='How long the workers run')
+        parser.add_argument('--writers', type=int, default=4, help='Processes inserting a session and an activity')
+        parser.add_argument('--readers', type=int, default=4, help='Processes reading timelines')
+        parser.add_argument(
+            '--baseline', action='store_true',
+            help='Use the pre-WAL settings: rollback journal, new connection per request, '
+                 'deferred transactions, 5 s timeout',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError("benchmark_sqlite only applies to SQLite")
+        if options['writers'] < 0 or options['readers'] < 0 or options['writers'] + options['readers'] < 1:
+            raise CommandError("--writers and --readers must add up to at least one process")
+
+        with tempfile.TemporaryDirectory() as directory:
+            connection.close()
+            connection.settings_dict['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            if options['baseline']:
+                connection.settings_dict['CONN_MAX_AGE'] = 0
+                connection.settings_dict['OPTIONS'] = {}
+                settings.SQLITE_PRAGMAS = BASELINE_PRAGMAS
+
+            call_command('migrate', verbosity=0, interactive=False)
+            user = User.objects.create_user('sqlite-benchmark', password=None)
+            # Every process opens its own connection after the fork
+            connections.close_all()
+
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            deadline = time.monotonic() + options['seconds']
+            roles = ['writer'] * options['writers'] + ['reader'] * options['readers']
+            processes = [
+                context.Process(target=_worker, args=(role, user.pk, deadline, results))
+                for role in roles
+            ]
+            for process in processes:
+                process.start()
+            totals = {'writer': [0, 0], 'reader': [0, 0]}
+            for _ in processes:
+                role, ok, failed = results.get()
+                totals[role][0] += ok
+                totals[role][1] += failed
+            for process in processes:
+                process.join()
+
+        seconds = options['seconds']
+        errors = totals['writer'][1] + totals['reader'][1]
+        mode = 'baseline (rollback journal)' if options['baseline'] else 'configured settings'
+        self.stdout.write(
+            f"{mode}: {options['writers']} writers, {options['readers']} readers, {seconds:g}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['writer'][0] / seconds:.0f} writes/s, {totals['reader'][0] / seconds:.0f} reads/s, "
+            f"{errors} \"database is locked\" errors"
+        ))
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from trendline.feeds import feed_names, ingest_all
+
+
+class Command(BaseCommand):
+    help = 'Fetch every news feed from NewsAPI into the local article store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'feeds', nargs='*',
+            help='Feeds to ingest (default: all categories plus the trending and recent feeds)',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and re-ingest every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=int,
+            default=getattr(settings, 'NEWS_INGEST_INTERVAL', 600),
+            help='Seconds between ingest runs when --loop is set',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.NEWS_API_KEY:
+            raise CommandError("NEWS_API_KEY is not set; add it to the environment or the project's .env file")
+
+        names = options['feeds'] or feed_names()
+        unknown = set(names) - set(feed_names())
+        if unknown:
+            raise CommandError(f"Unknown feed(s): {', '.join(sorted(unknown))}")
+        if options['loop']:
+            self.check_budget(len(names), options['interval'])
+
+        while True:
+            started = time.monotonic()
+            results = ingest_all(names)
+            elapsed = time.monotonic() - started
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Ingested {sum(results.values())} articles from {len(results)} feeds in {elapsed:.1f}s"
+            ))
+            for name, count in results.items():
+                self.stdout.write(f"  {name}: {count}")
+
+            if not options['loop']:
+                break
+            time.sleep(max(0, options['interval'] - elapsed))
+
+    def check_budget(self, feeds, interval):
+        """Warn when this schedule would use more than its share of the NewsAPI budget"""
+        budget = getattr(settings, 'NEWS_API_BUDGET', None)
+        if not budget:
+            return
+
+        share = getattr(settings, 'NEWS_INGEST_BUDGET_SHARE', 0.5)
+        calls_per_day = feeds * 86400 / max(interval, 1)
+        allowance = budget['daily_budget'] * share
+        if calls_per_day > allowance:
+            self.stderr.write(self.style.WARNING(
+                f"{feeds} feeds every {interval}s is {calls_per_day:.0f} NewsAPI calls/day, over the "
+                f"ingest allowance of {allowance:.0f} ({share:.0%} of {budget['daily_budget']}); "
+                f"feeds will be throttled. Use --interval {int(feeds * 86400 / allowance) + 1} or more."
+            ))
+        if feeds > budget['capacity']:
+            self.stderr.write(self.style.WARNING(
+                f"{feeds} feeds per run exceed the budget burst capacity ({budget['capacity']}); "
+                f"the last feeds of every run will be throttled"
+            ))
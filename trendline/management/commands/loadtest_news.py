@@ -0,0 +1,68 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test a running TrendLine server, e.g. to compare the WSGI views '
+        '(gunicorn) with the async views (uvicorn, NEWS_ASYNC_VIEWS=true)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL to request, e.g. http://127.0.0.1:8000/api/sidebar/')
+        parser.add_argument('--requests', '-n', type=int, default=500, help='Total requests to send')
+        parser.add_argument('--concurrency', '-c', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        if httpx is None:
+            raise CommandError("loadtest_news requires httpx (pip install httpx)")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        latencies, errors, elapsed = asyncio.run(self.run(options))
+        if not latencies:
+            raise CommandError(f"All {errors} requests failed")
+
+        latencies.sort()
+        pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(latencies)} ok / {errors} failed in {elapsed:.2f}s "
+            f"({len(latencies) / elapsed:.1f} req/s)"
+        ))
+        self.stdout.write(
+            f"latency ms: mean {statistics.mean(latencies) * 1000:.0f}  p50 {pick(0.50):.0f}  "
+            f"p90 {pick(0.90):.0f}  p99 {pick(0.99):.0f}  max {latencies[-1] * 1000:.0f}"
+        )
+
+    async def run(self, options):
+        latencies = []
+        errors = 0
+        remaining = options['requests']
+        limits = httpx.Limits(max_connections=options['concurrency'])
+
+        async with httpx.AsyncClient(timeout=options['timeout'], limits=limits) as client:
+            async def worker():
+                nonlocal remaining, errors
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(options['url'])
+                        response.raise_for_status()
+                    except httpx.HTTPError:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            return latencies, errors, time.perf_counter() - started
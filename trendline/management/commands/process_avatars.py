@@ -0,0 +1,63 @@
+import posixpath
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from trendline.avatars import InvalidAvatar, avatar_processor, normalize_avatar
+from trendline.models import UserProfile
+
+# Names given by normalize_avatar(); anything else is an original upload
+NORMALIZED_NAME = re.compile(r'^[0-9a-f]{32}\.(webp|jpg)$')
+
+
+class Command(BaseCommand):
+    help = 'Normalize avatars and generate their thumbnails (for uploads made before the pipeline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate thumbnails for every avatar, not just those without any',
+        )
+        parser.add_argument(
+            '--no-normalize', action='store_true',
+            help='Keep the stored originals; only generate thumbnails',
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True).order_by('pk')
+        if not options['all']:
+            profiles = profiles.filter(avatar_sizes=[])
+
+        started = time.monotonic()
+        processed = failed = 0
+        for profile in profiles.iterator():
+            name = profile.avatar.name
+            old_name, old_sizes = None, profile.avatar_sizes
+
+            if not options['no_normalize'] and not NORMALIZED_NAME.match(posixpath.basename(name)):
+                try:
+                    with profile.avatar.open('rb') as original:
+                        normalized = normalize_avatar(original)
+                except (InvalidAvatar, OSError) as e:
+                    self.stderr.write(f"Skipping {name}: {e}")
+                    failed += 1
+                    continue
+                old_name = name
+                with transaction.atomic():
+                    profile.avatar.save(normalized.name, normalized, save=False)
+                    profile.avatar_sizes = []
+                    profile.save(update_fields=['avatar', 'avatar_sizes', 'updated_at'])
+            elif old_sizes:
+                # Regenerating in place: the old thumbnails are overwritten
+                old_sizes = []
+
+            avatar_processor.process(profile.pk, profile.user_id, profile.avatar.name,
+                                     old_name=old_name, old_sizes=old_sizes)
+            processed += 1
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} avatars ({failed} skipped) in {elapsed:.1f}s"
+        ))
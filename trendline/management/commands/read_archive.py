@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from trendline.archive import ARCHIVES, archived_months, read_archive
+
+
+class Command(BaseCommand):
+    help = 'Print archived UserActivity or LoginSession rows as JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(ARCHIVES))
+        parser.add_argument(
+            'months', nargs='*',
+            help='Months to read as YYYY-MM (default: list the archived months)',
+        )
+        parser.add_argument('--dir', default=None, help='Archive directory (default: ACTIVITY_ARCHIVE_DIR)')
+        parser.add_argument('--user', help='Only rows for this username')
+        parser.add_argument('--type', dest='activity_type', help='Only this activity type')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many rows')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+
+        if not options['months']:
+            for month in archived_months(kind, options['dir']):
+                self.stdout.write(month)
+            return
+
+        printed = 0
+        for month in options['months']:
+            for row in read_archive(kind, month, options['dir'],
+                                    username=options['user'], activity_type=options['activity_type']):
+                self.stdout.write(json.dumps(row))
+                printed += 1
+                if options['limit'] and printed >= options['limit']:
+                    return
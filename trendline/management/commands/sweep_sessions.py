@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trendline.sessions import SWEEP_BATCH_SIZE, close_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Close LoginSessions whose Django session has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SWEEP_BATCH_SIZE,
+            help='Open sessions checked per batch (one UPDATE each)',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and sweep every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=3600,
+            help='Seconds between sweeps when --loop is set',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            closed = close_stale_sessions(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Closed {closed} stale login sessions in {elapsed:.1f}s"
+            ))
+
+            if not options['loop']:
+                break
+            time.sleep(max(0, options['interval'] - elapsed))
@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from trendline.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the read replica file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and re-sync every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=int,
+            default=getattr(settings, 'DB_REPLICA_SYNC_INTERVAL', 30),
+            help='Seconds between syncs when --loop is set (keep below DB_REPLICA_STICKY_SECONDS)',
+        )
+
+    def handle(self, *args, **options):
+        replica = settings.DATABASES.get(REPLICA_ALIAS)
+        if replica is None:
+            raise CommandError("No replica configured (set DB_REPLICA_PATH)")
+        primary = connections['default']
+        if primary.vendor != 'sqlite' or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError("sync_replica only copies SQLite databases; use the server's replication")
+
+        sticky = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10)
+        if options['loop'] and options['interval'] >= sticky:
+            self.stderr.write(self.style.WARNING(
+                f"--interval {options['interval']}s is not below DB_REPLICA_STICKY_SECONDS ({sticky}s); "
+                f"users may not see their own writes after the pin expires"
+            ))
+
+        while True:
+            started = time.monotonic()
+            primary.ensure_connection()
+            target = sqlite3.connect(str(replica['NAME']))
+            try:
+                # Copy in small steps so writers on the primary are not held up
+                primary.connection.backup(target, pages=1024, sleep=0.005)
+            finally:
+                target.close()
+            elapsed = time.monotonic() - started
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Copied {settings.DATABASES['default']['NAME']} to {replica['NAME']} in {elapsed:.2f}s"
+            ))
+
+            if not options['loop']:
+                break
+            time.sleep(max(0, options['interval'] - elapsed))
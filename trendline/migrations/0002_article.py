@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Article',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=1000, unique=True)),
+                ('title', models.CharField(max_length=500)),
+                ('description', models.TextField(blank=True)),
+                ('content', models.TextField(blank=True)),
+                ('author', models.CharField(blank=True, max_length=255)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('url_to_image', models.URLField(blank=True, max_length=1000)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-published_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='trendline.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'seen_at'], name='trendline_a_name_80a04d_idx')],
+                'unique_together': {('article', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_url_hash(apps, schema_editor):
+    Article = apps.get_model('trendline', 'Article')
+    articles = list(Article.objects.only('id', 'url'))
+    for article in articles:
+        article.url_hash = hashlib.sha256(article.url.encode('utf-8')).hexdigest()
+    Article.objects.bulk_update(articles, ['url_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0002_article'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='url_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='article',
+            name='url_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='url',
+            field=models.URLField(max_length=1000),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='published_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
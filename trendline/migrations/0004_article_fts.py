@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+# SQLite FTS5 index over stored articles, kept in sync by triggers. The
+# table uses external content, so it only stores the inverted index.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS trendline_article_fts USING fts5(
+        title, description, source,
+        content='trendline_article', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trendline_article_fts_ai AFTER INSERT ON trendline_article BEGIN
+        INSERT INTO trendline_article_fts(rowid, title, description, source)
+        VALUES (new.id, new.title, new.description, new.source);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trendline_article_fts_ad AFTER DELETE ON trendline_article BEGIN
+        INSERT INTO trendline_article_fts(trendline_article_fts, rowid, title, description, source)
+        VALUES ('delete', old.id, old.title, old.description, old.source);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trendline_article_fts_au AFTER UPDATE ON trendline_article BEGIN
+        INSERT INTO trendline_article_fts(trendline_article_fts, rowid, title, description, source)
+        VALUES ('delete', old.id, old.title, old.description, old.source);
+        INSERT INTO trendline_article_fts(rowid, title, description, source)
+        VALUES (new.id, new.title, new.description, new.source);
+    END
+    """,
+    "INSERT INTO trendline_article_fts(trendline_article_fts) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS trendline_article_fts_ai",
+    "DROP TRIGGER IF EXISTS trendline_article_fts_ad",
+    "DROP TRIGGER IF EXISTS trendline_article_fts_au",
+    "DROP TABLE IF EXISTS trendline_article_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_FTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_FTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0003_article_url_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0006_activityrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loginsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'session_key', '-login_time'], name='loginsession_user_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginsession',
+            index=models.Index(fields=['-login_time'], name='loginsession_login_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['login_time'], name='loginsession_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', '-timestamp'], name='activity_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['activity_type', '-timestamp'], name='activity_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['-timestamp'], name='activity_time_idx'),
+        ),
+    ]
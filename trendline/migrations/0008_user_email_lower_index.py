@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import migrations
+
+
+# Case-insensitive email lookups on auth_user. The plain expression index
+# serves `LOWER(email) = ...` queries; the partial unique index stops two
+# accounts sharing an email in different cases (blank emails are allowed).
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (LOWER(email))",
+    "CREATE UNIQUE INDEX IF NOT EXISTS auth_user_email_lower_uniq ON auth_user (LOWER(email)) WHERE email <> ''",
+]
+
+DROP_INDEXES = [
+    "DROP INDEX IF EXISTS auth_user_email_lower_uniq",
+    "DROP INDEX IF EXISTS auth_user_email_lower_idx",
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT LOWER(email) FROM auth_user WHERE email <> '' "
+            "GROUP BY LOWER(email) HAVING COUNT(*) > 1"
+        )
+        duplicates = [row[0] for row in cursor.fetchall()]
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add a unique index on auth_user email: these emails belong to "
+            f"more than one account: {', '.join(duplicates)}"
+        )
+
+    for statement in CREATE_INDEXES:
+        schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for statement in DROP_INDEXES:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trendline', '0007_activity_session_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
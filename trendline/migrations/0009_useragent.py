@@ -0,0 +1,91 @@
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def _models(apps):
+    return [apps.get_model('trendline', 'LoginSession'), apps.get_model('trendline', 'UserActivity')]
+
+
+def backfill_user_agents(apps, schema_editor):
+    UserAgent = apps.get_model('trendline', 'UserAgent')
+
+    values = set()
+    for model in _models(apps):
+        values.update(
+            model.objects.exclude(user_agent='').values_list('user_agent', flat=True).distinct()
+        )
+    UserAgent.objects.bulk_create(
+        [UserAgent(ua_hash=_hash(value), value=value) for value in values],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    ids = dict(UserAgent.objects.values_list('ua_hash', 'id'))
+
+    # One UPDATE per distinct string; a few hundred cover nearly all rows
+    for model in _models(apps):
+        for value in values:
+            model.objects.filter(user_agent=value).update(user_agent_ref=ids[_hash(value)])
+
+
+def restore_user_agents(apps, schema_editor):
+    UserAgent = apps.get_model('trendline', 'UserAgent')
+    for model in _models(apps):
+        for ua_id, value in UserAgent.objects.values_list('id', 'value'):
+            model.objects.filter(user_agent_ref=ua_id).update(user_agent=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0008_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ua_hash', models.CharField(editable=False, max_length=64, unique=True)),
+                ('value', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'User Agent',
+                'verbose_name_plural': 'User Agents',
+            },
+        ),
+        migrations.AddField(
+            model_name='loginsession',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='login_sessions', to='trendline.useragent'),
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activities', to='trendline.useragent'),
+        ),
+        migrations.RunPython(backfill_user_agents, restore_user_agents),
+        migrations.RemoveField(
+            model_name='loginsession',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='useractivity',
+            name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='loginsession',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='useractivity',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+    ]
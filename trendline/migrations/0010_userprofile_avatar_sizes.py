@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trendline', '0009_useragent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_sizes',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+import hashlib
+import posixpath
+import threading
+from collections import OrderedDict
+
+from django.db import models, transaction
 from django.contrib.auth.models import User  # Using default User model
+from django.contrib.auth.signals import user_logged_out
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -27,6 +33,8 @@ class UserProfile(models.Model):
     
     # Media
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Square thumbnail sizes (px) generated for the current avatar
+    avatar_sizes = models.JSONField(default=list, blank=True, editable=False)
     cover_image = models.ImageField(upload_to='covers/', null=True, blank=True)
     
     # Social media links
@@ -69,11 +77,27 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.email}'s profile" if self.user.email else f"{self.user.username}'s profile"
     
-    def get_avatar_url(self):
-        """Return avatar URL or default"""
-        if self.avatar:
-            return self.avatar.url
-        return '/static/images/default_avatar.png'
+    def get_avatar_url(self, size=None):
+        """
+        Return avatar URL or default. With ``size`` (px), return the smallest
+        generated thumbnail at least that big, falling back to the largest one
+        and then to the full avatar while thumbnails are still being made.
+        """
+        if not self.avatar:
+            return '/static/images/default_avatar.png'
+
+        sizes = sorted(self.avatar_sizes or [])
+        if size and sizes:
+            chosen = next((s for s in sizes if s >= size), sizes[-1])
+            return self.avatar.storage.url(self.avatar_variant_name(self.avatar.name, chosen))
+        return self.avatar.url
+
+    @staticmethod
+    def avatar_variant_name(name, size):
+        """Storage name of a thumbnail, e.g. avatars/thumbs/<name>_128.webp"""
+        directory, filename = posixpath.split(name)
+        stem, ext = posixpath.splitext(filename)
+        return posixpath.join(directory, 'thumbs', f"{stem}_{size}{ext}")
     
     def get_age(self):
         """Calculate and return age from birth_date"""
@@ -83,13 +107,65 @@ class UserProfile(models.Model):
         return None
 
 
+class UserAgent(models.Model):
+    """Distinct User-Agent strings, referenced by sessions and activities"""
+    ua_hash = models.CharField(max_length=64, unique=True, editable=False)
+    value = models.TextField()
+
+    # Recently used UA string -> id, so most requests need no lookup query
+    CACHE_SIZE = 1024
+    _ids = OrderedDict()
+    _ids_lock = threading.Lock()
+
+    class Meta:
+        verbose_name = 'User Agent'
+        verbose_name_plural = 'User Agents'
+
+    def __str__(self):
+        return self.value
+
+    @staticmethod
+    def hash_value(value):
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def id_for(cls, value):
+        """Return the id for a User-Agent string, creating its row if needed (None if blank)"""
+        if not value:
+            return None
+
+        with cls._ids_lock:
+            ua_id = cls._ids.get(value)
+            if ua_id is not None:
+                cls._ids.move_to_end(value)
+                return ua_id
+
+        user_agent, _ = cls.objects.get_or_create(
+            ua_hash=cls.hash_value(value), defaults={'value': value},
+        )
+        # Don't cache an id that a rolled-back transaction would take away: the
+        # row may have been created earlier in the same, still open transaction.
+        # Outside a transaction this runs immediately.
+        transaction.on_commit(lambda: cls._remember(value, user_agent.id))
+        return user_agent.id
+
+    @classmethod
+    def _remember(cls, value, ua_id):
+        with cls._ids_lock:
+            cls._ids[value] = ua_id
+            cls._ids.move_to_end(value)
+            while len(cls._ids) > cls.CACHE_SIZE:
+                cls._ids.popitem(last=False)
+
+
 class LoginSession(models.Model):
     """Track user login sessions for security and analytics"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_sessions')
     login_time = models.DateTimeField(auto_now_add=True)
     logout_time = models.DateTimeField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    user_agent = models.ForeignKey(UserAgent, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='login_sessions')
     session_key = models.CharField(max_length=40, blank=True)
     is_active = models.BooleanField(default=True)
     
@@ -101,6 +177,16 @@ class LoginSession(models.Model):
         verbose_name = 'Login Session'
         verbose_name_plural = 'Login Sessions'
         ordering = ['-login_time']
+        indexes = [
+            # Closing the current session on logout (partial: open sessions only)
+            models.Index(fields=['user', 'session_key', '-login_time'], condition=models.Q(is_active=True),
+                         name='loginsession_user_key_idx'),
+            # Admin list and date hierarchy
+            models.Index(fields=['-login_time'], name='loginsession_login_time_idx'),
+            # Sessions still open, for sweeping stale ones
+            models.Index(fields=['login_time'], condition=models.Q(is_active=True),
+                         name='loginsession_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.login_time.strftime('%Y-%m-%d %H:%M')}"
@@ -128,9 +214,11 @@ class UserActivity(models.Model):
     ]
     activity_type = models.CharField(max_length=20, choices=activity_type_choices)
     description = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the activity is recorded, not when the buffered row is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    user_agent = models.ForeignKey(UserAgent, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='activities')
     
     # Additional metadata
     metadata = models.JSONField(default=dict, blank=True)
@@ -139,11 +227,33 @@ class UserActivity(models.Model):
         verbose_name = 'User Activity'
         verbose_name_plural = 'User Activities'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='activity_user_time_idx'),
+            models.Index(fields=['activity_type', '-timestamp'], name='activity_type_time_idx'),
+            models.Index(fields=['-timestamp'], name='activity_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.activity_type} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
 
+class ActivityRollup(models.Model):
+    """Hourly per-user counts for high-volume activity types (e.g. dashboard views)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    activity_type = models.CharField(max_length=20, choices=UserActivity.activity_type_choices)
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Activity Rollup'
+        verbose_name_plural = 'Activity Rollups'
+        ordering = ['-hour']
+        unique_together = ('user', 'activity_type', 'hour')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.activity_type} - {self.hour.strftime('%Y-%m-%d %H:00')}: {self.count}"
+
+
 class ChatConversation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_id = models.CharField(max_length=100, null=True, blank=True)  # For anonymous users
@@ -171,13 +281,96 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.message_type}: {self.content[:50]}..."
 
+class Article(models.Model):
+    """News article ingested from NewsAPI, deduplicated by URL hash"""
+    url_hash = models.CharField(max_length=64, unique=True, editable=False)
+    url = models.URLField(max_length=1000)
+    title = models.CharField(max_length=500)
+    description = models.TextField(blank=True)
+    content = models.TextField(blank=True)
+    author = models.CharField(max_length=255, blank=True)
+    source = models.CharField(max_length=255, blank=True)
+    url_to_image = models.URLField(max_length=1000, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-published_at']
+
+    def __str__(self):
+        return self.title[:80]
+
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.url_hash = self.hash_url(self.url)
+        super().save(*args, **kwargs)
+
+    @property
+    def categories(self):
+        return [tag.name for tag in self.tags.all()]
+
+    def as_api_dict(self):
+        """Return the article in NewsAPI's response shape"""
+        return {
+            'source': {'id': None, 'name': self.source},
+            'author': self.author or None,
+            'title': self.title,
+            'description': self.description or None,
+            'url': self.url,
+            'urlToImage': self.url_to_image or None,
+            'publishedAt': self.published_at.strftime('%Y-%m-%dT%H:%M:%SZ') if self.published_at else '',
+            'content': self.content or None,
+        }
+
+
+class ArticleTag(models.Model):
+    """Feed/category an article was seen in (e.g. 'sports', 'trending')"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='tags')
+    name = models.CharField(max_length=30)
+    seen_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('article', 'name')
+        indexes = [
+            models.Index(fields=['name', 'seen_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name}: {self.article_id}"
+
+# User fields shown as part of the profile; saving them counts as a profile update
+PROFILE_USER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
 # Signals to automatically create and save profiles
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
     """Automatically create UserProfile when User is created"""
     if created:
         UserProfile.objects.get_or_create(user=instance)
-    else:
-        # Only save if profile exists
-        if hasattr(instance, 'userprofile'):
-            instance.userprofile.save()
\ No newline at end of file
+        return
+
+    # Partial saves such as login()'s last_login update leave the profile alone
+    if update_fields is not None and not PROFILE_USER_FIELDS.intersection(update_fields):
+        return
+
+    # Only bump updated_at: one UPDATE, without loading or rewriting the profile row
+    now = timezone.now()
+    UserProfile.objects.filter(user=instance).update(updated_at=now)
+    if User.userprofile.is_cached(instance):
+        instance.userprofile.updated_at = now
+
+
+@receiver(user_logged_out)
+def close_login_session(sender, request, user, **kwargs):
+    """Mark the LoginSession for the session being logged out as closed"""
+    if user is None or request is None or not request.session.session_key:
+        return
+    LoginSession.objects.filter(
+        user=user,
+        session_key=request.session.session_key,
+        is_active=True,
+    ).update(is_active=False, logout_time=timezone.now())
\ No newline at end of file
@@ -0,0 +1,442 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from .ratelimit import CircuitBreaker, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_BASE_URL = "https://newsapi.org/v2"
+
+# Seconds a successful payload stays cached, per endpoint
+DEFAULT_CACHE_TTLS = {
+    'top-headlines': 120,
+    'everything': 600,
+}
+DEFAULT_CACHE_TTL = 300
+
+# Seconds an expired payload may still be served while it is refreshed
+DEFAULT_STALE_TTL = 900
+
+# Overall deadline (seconds) for a fetch_many fan-out
+DEFAULT_FANOUT_TIMEOUT = 8
+
+# Seconds a failed call keeps health() reporting unhealthy; afterwards the
+# next real call gets to find out again
+HEALTH_ERROR_WINDOW = 30
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised instead of calling NewsAPI when the budget or circuit breaker says no"""
+
+
+class NewsAPIClient:
+    """
+    Shared NewsAPI client with a keep-alive session and bounded connection pool.
+
+    All upstream calls go through ``request`` so timeouts, retries and
+    statistics are handled in one place. ``fetch`` (and the ``everything`` /
+    ``top_headlines`` shortcuts) additionally serve payloads from Django's
+    cache, keyed by endpoint and normalized params.
+
+    Expired entries are served stale while a single background refresh runs,
+    and concurrent misses for the same key share one upstream call. Upstream
+    calls are metered by an optional token bucket and stopped by an optional
+    circuit breaker; cached payloads keep being served while either blocks.
+    """
+
+    def __init__(self, api_key, base_url=NEWS_API_BASE_URL, timeout=(3.05, 10),
+                 pool_size=10, max_retries=2, backoff_factor=0.5,
+                 cache_alias='default', cache_ttls=None, stale_ttl=DEFAULT_STALE_TTL,
+                 fanout_timeout=DEFAULT_FANOUT_TIMEOUT, bucket=None, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache_alias = cache_alias
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self.stale_ttl = stale_ttl
+        self.fanout_timeout = fanout_timeout
+        self.bucket = bucket
+        self.breaker = breaker
+
+        self._session = None
+        self._executor = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'stale_hits': 0,
+            'coalesced': 0,
+            'refreshes': 0,
+            'throttled': 0,
+            'breaker_rejections': 0,
+            'status_codes': {},
+        }
+        # Outcome of the most recent upstream call, used by health()
+        self._last_call = {'status_code': None, 'error': None, 'at': None}
+
+        # Per-key single-flight state: key -> [lock, waiters]
+        self._flight_lock = threading.Lock()
+        self._flights = {}
+        self._refreshing = set()
+
+    @property
+    def session(self):
+        """Lazily build the pooled session (one per process)"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    @property
+    def executor(self):
+        """Lazily build the thread pool used for concurrent fetches"""
+        if self._executor is None:
+            with self._session_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size,
+                        thread_name_prefix='newsapi',
+                    )
+        return self._executor
+
+    def require_api_key(self):
+        """Raise ImproperlyConfigured instead of calling NewsAPI without a key"""
+        if not self.api_key:
+            raise ImproperlyConfigured(
+                "NEWS_API_KEY is not set; add it to the environment or the project's .env file"
+            )
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'X-Api-Key': self.api_key,
+            'User-Agent': 'TrendLine/1.0',
+        })
+        return session
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def url_for(self, endpoint):
+        return f"{self.base_url}/{endpoint.strip('/')}"
+
+    @staticmethod
+    def clean_params(params):
+        """Drop empty values and the API key (sent as a header instead)"""
+        return {k: v for k, v in (params or {}).items() if v is not None and k != 'apiKey'}
+
+    def cache_key(self, endpoint, params):
+        """Stable cache key for an endpoint and its (order-independent) params"""
+        query = urlencode(sorted((k, str(v)) for k, v in self.clean_params(params).items()))
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return f"newsapi:{endpoint.strip('/')}:{digest}"
+
+    def ttl_for(self, endpoint):
+        return self.cache_ttls.get(endpoint.strip('/'), DEFAULT_CACHE_TTL)
+
+    def request(self, endpoint, params=None, timeout=None):
+        """
+        GET an endpoint (e.g. 'everything', 'top-headlines') and return the response.
+        Raises requests.RequestException on network failures.
+        """
+        self.require_api_key()
+        params = self.clean_params(params)
+        self.before_request()
+
+        try:
+            response = self.session.get(
+                self.url_for(endpoint),
+                params=params,
+                timeout=timeout or self.timeout,
+            )
+        except requests.RequestException as e:
+            self.after_error(e)
+            raise
+
+        self.after_response(response.status_code, response.headers)
+        return response
+
+    def before_request(self):
+        """Consult the circuit breaker and budget; raise UpstreamUnavailable if either refuses"""
+        if self.breaker is not None and not self.breaker.allow():
+            self.count('breaker_rejections')
+            raise UpstreamUnavailable("NewsAPI circuit breaker is open")
+        if self.bucket is not None and not self.bucket.acquire():
+            if self.breaker is not None:
+                self.breaker.cancel()
+            self.count('throttled')
+            raise UpstreamUnavailable("NewsAPI request budget exhausted")
+
+    def after_error(self, error):
+        self._record(None, error=error)
+        if self.breaker is not None:
+            self.breaker.record_failure(type(error).__name__)
+
+    def after_response(self, status_code, headers):
+        self._record(status_code)
+        if self.breaker is None:
+            return
+        if status_code == 429:
+            retry_after = headers.get('Retry-After')
+            self.breaker.record_failure(
+                '429', retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        elif status_code >= 500:
+            self.breaker.record_failure(str(status_code))
+        else:
+            self.breaker.record_success()
+
+    def get_json(self, endpoint, params=None, timeout=None):
+        """GET an endpoint and return the decoded JSON payload"""
+        return self.request(endpoint, params=params, timeout=timeout).json()
+
+    def fetch(self, endpoint, params=None, ttl=None):
+        """
+        Return the JSON payload for an endpoint, served from the cache when possible.
+        Only successful ('status': 'ok') payloads are cached.
+        """
+        params = self.clean_params(params)
+        key = self.cache_key(endpoint, params)
+        ttl = self.ttl_for(endpoint) if ttl is None else ttl
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.count('cache_hits')
+            if entry['expires_at'] <= time.time():
+                self.count('stale_hits')
+                # Keep serving the stale copy without retrying while upstream is blocked
+                if self.breaker is None or not self.breaker.is_open:
+                    self._refresh_in_background(endpoint, params, key, ttl)
+            return entry['data']
+
+        self.count('cache_misses')
+        return self._load(endpoint, params, key, ttl)
+
+    def fetch_many(self, calls, timeout=None):
+        """
+        Run several ``fetch`` calls concurrently and return their payloads by name.
+
+        ``calls`` maps a name to ``(endpoint, params)``. Calls that fail or are
+        still running when the deadline passes come back as None; late calls
+        keep running and warm the cache for the next request.
+        """
+        futures = {
+            name: self.executor.submit(self.fetch, endpoint, params)
+            for name, (endpoint, params) in calls.items()
+        }
+        done, _ = wait(futures.values(), timeout=timeout or self.fanout_timeout)
+
+        results = {}
+        for name, future in futures.items():
+            if future not in done:
+                logger.warning(f"NewsAPI fetch '{name}' missed the fan-out deadline")
+                results[name] = None
+            elif future.exception() is not None:
+                logger.warning(f"NewsAPI fetch '{name}' failed: {future.exception()}")
+                results[name] = None
+            else:
+                results[name] = future.result()
+        return results
+
+    def _load(self, endpoint, params, key, ttl):
+        """Fetch upstream on a miss, letting only one caller per key through"""
+        with self._single_flight(key):
+            # Another caller may have filled the cache while we waited
+            entry = self.cache.get(key)
+            if entry is not None and entry['expires_at'] > time.time():
+                self.count('coalesced')
+                return entry['data']
+
+            data = self.get_json(endpoint, params)
+            self.store(key, data, ttl)
+            return data
+
+    def store(self, key, data, ttl):
+        if isinstance(data, dict) and data.get('status') == 'ok':
+            entry = {'data': data, 'expires_at': time.time() + ttl}
+            self.cache.set(key, entry, ttl + self.stale_ttl)
+
+    async def astore(self, key, data, ttl):
+        if isinstance(data, dict) and data.get('status') == 'ok':
+            entry = {'data': data, 'expires_at': time.time() + ttl}
+            await self.cache.aset(key, entry, ttl + self.stale_ttl)
+
+    @contextmanager
+    def _single_flight(self, key):
+        with self._flight_lock:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._flight_lock:
+                flight[1] -= 1
+                if flight[1] == 0:
+                    self._flights.pop(key, None)
+
+    def _refresh_in_background(self, endpoint, params, key, ttl):
+        """Queue a refresh for a stale key on the shared executor unless one is already running"""
+        with self._flight_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self._single_flight(key):
+                    self.count('refreshes')
+                    self.store(key, self.get_json(endpoint, params), ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {endpoint}: {e}")
+            finally:
+                with self._flight_lock:
+                    self._refreshing.discard(key)
+
+        self.executor.submit(run)
+
+    def everything(self, **params):
+        return self.fetch('everything', params)
+
+    def top_headlines(self, **params):
+        return self.fetch('top-headlines', params)
+
+    def count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _record(self, status_code, error=None):
+        with self._stats_lock:
+            self._last_call = {
+                'status_code': status_code,
+                'error': type(error).__name__ if error is not None else None,
+                'at': time.time(),
+            }
+            self._stats['requests'] += 1
+            if status_code is None or status_code >= 400:
+                self._stats['errors'] += 1
+            if status_code is not None:
+                codes = self._stats['status_codes']
+                codes[status_code] = codes.get(status_code, 0) + 1
+
+    def health(self):
+        """
+        Upstream health derived from the breaker and the latest real call.
+        Never touches the network, so it is cheap enough to check per request.
+        """
+        with self._stats_lock:
+            last = dict(self._last_call)
+
+        if self.breaker is not None and self.breaker.is_open:
+            if self.breaker.state()['last_failure'] == '429':
+                error = "API rate limit exceeded. Please try again later."
+            else:
+                error = "News API is temporarily unavailable. Please try again later."
+            return {'healthy': False, 'error': error, 'last_call_at': last['at']}
+
+        if last['at'] is None or time.time() - last['at'] > HEALTH_ERROR_WINDOW:
+            error = None
+        elif last['status_code'] == 401:
+            error = "API key is invalid or expired. Please check your News API key."
+        elif last['error'] in ('Timeout', 'ReadTimeout', 'ConnectTimeout'):
+            error = "Request timeout. News API is taking too long to respond."
+        elif last['error'] == 'ConnectionError':
+            error = "Connection error. Please check your internet connection."
+        else:
+            error = None
+
+        return {'healthy': error is None, 'error': error, 'last_call_at': last['at']}
+
+    def stats(self):
+        """Return request counters and connection pool usage"""
+        with self._stats_lock:
+            data = {
+                'requests': self._stats['requests'],
+                'errors': self._stats['errors'],
+                'cache_hits': self._stats['cache_hits'],
+                'cache_misses': self._stats['cache_misses'],
+                'stale_hits': self._stats['stale_hits'],
+                'coalesced': self._stats['coalesced'],
+                'refreshes': self._stats['refreshes'],
+                'throttled': self._stats['throttled'],
+                'breaker_rejections': self._stats['breaker_rejections'],
+                'status_codes': dict(self._stats['status_codes']),
+            }
+        data['budget'] = self.bucket.state() if self.bucket is not None else None
+        data['breaker'] = self.breaker.state() if self.breaker is not None else None
+        with self._flight_lock:
+            data['in_flight'] = len(self._flights)
+            data['refreshing'] = len(self._refreshing)
+
+        pools = []
+        if self._session is not None:
+            adapter = self._session.get_adapter(self.base_url)
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append({
+                    'host': pool.host,
+                    'num_connections': pool.num_connections,
+                    'num_requests': pool.num_requests,
+                    'idle': pool.pool.qsize() if pool.pool else 0,
+                    'maxsize': pool.pool.maxsize if pool.pool else self.pool_size,
+                })
+        data['pools'] = pools
+        return data
+
+
+_cache_alias = getattr(settings, 'NEWS_API_CACHE_ALIAS', 'default')
+_budget = getattr(settings, 'NEWS_API_BUDGET', None)
+_breaker = getattr(settings, 'NEWS_API_BREAKER', None)
+
+news_client = NewsAPIClient(
+    api_key=settings.NEWS_API_KEY,
+    base_url=getattr(settings, 'NEWS_API_BASE_URL', NEWS_API_BASE_URL),
+    timeout=getattr(settings, 'NEWS_API_TIMEOUT', (3.05, 10)),
+    pool_size=getattr(settings, 'NEWS_API_POOL_SIZE', 10),
+    max_retries=getattr(settings, 'NEWS_API_MAX_RETRIES', 2),
+    cache_alias=_cache_alias,
+    cache_ttls=getattr(settings, 'NEWS_API_CACHE_TTLS', None),
+    stale_ttl=getattr(settings, 'NEWS_API_STALE_TTL', DEFAULT_STALE_TTL),
+    fanout_timeout=getattr(settings, 'NEWS_API_FANOUT_TIMEOUT', DEFAULT_FANOUT_TIMEOUT),
+    bucket=TokenBucket(cache_alias=_cache_alias, **_budget) if _budget else None,
+    breaker=CircuitBreaker(cache_alias=_cache_alias, **_breaker) if _breaker else None,
+)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from .models import PROFILE_USER_FIELDS, UserProfile
+
+
+AVATAR_DISPLAY_SIZE = 256
+
+
+def _cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def profile_cache_key(user_id):
+    return f"profile:{user_id}"
+
+
+def profile_data(user, profile):
+    """The profile as returned by the profile API"""
+    return {
+        'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'email': user.email,
+        'phone_number': profile.phone_number or '',
+        'bio': profile.bio or '',
+        'website': profile.website or '',
+        'location': profile.location or '',
+        'birth_date': profile.birth_date.strftime('%Y-%m-%d') if profile.birth_date else '',
+        'gender': profile.gender or '',
+        # The dashboard shows a 120px avatar; 256 covers 2x displays
+        'avatar_url': profile.get_avatar_url(size=AVATAR_DISPLAY_SIZE),
+        'email_notifications': profile.email_notifications,
+        'sms_notifications': profile.sms_notifications,
+        'marketing_emails': profile.marketing_emails,
+    }
+
+
+def store_profile(user, profile):
+    """Serialize a profile into the cache (write-through) and return the entry"""
+    data = profile_data(user, profile)
+    body = json.dumps(data, sort_keys=True)
+    entry = {
+        'profile': data,
+        'etag': hashlib.sha1(body.encode('utf-8')).hexdigest(),
+    }
+    _cache().set(profile_cache_key(user.pk), entry, getattr(settings, 'PROFILE_CACHE_TTL', 30))
+    return entry
+
+
+def cached_profile(user):
+    """Return {'profile': ..., 'etag': ...} for a user, loading it on a cache miss"""
+    entry = _cache().get(profile_cache_key(user.pk))
+    if entry is not None:
+        return entry
+
+    # Whatever is read here is cached for PROFILE_CACHE_TTL, so read the
+    # primary: a lagging replica could cache a stale profile (e.g. the URL of
+    # an avatar that was just replaced and deleted) for the whole TTL
+    profile = UserProfile.objects.using('default').filter(user=user).first()
+    if profile is None:
+        profile, created = UserProfile.objects.get_or_create(user=user)
+    return store_profile(user, profile)
+
+
+def invalidate_profile(user_id):
+    _cache().delete(profile_cache_key(user_id))
+
+
+# Writes that don't go through the profile API (admin, forms) drop the entry;
+# connected to UserProfile post_save/post_delete and User post_save in apps.py
+def invalidate_on_profile_change(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+
+
+def invalidate_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not PROFILE_USER_FIELDS.intersection(update_fields):
+        return
+    invalidate_profile(instance.pk)
@@ -0,0 +1,164 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import caches
+
+
+class TokenBucket:
+    """
+    Process-local token bucket, optionally backed by a shared daily quota.
+
+    ``capacity`` tokens allow short bursts; tokens refill at ``daily_budget``
+    per 24h. With ``shared=True`` every process also increments a per-day
+    counter in Django's cache, so the quota holds across workers.
+    """
+
+    def __init__(self, daily_budget, capacity, shared=False, cache_alias='default',
+                 key_prefix='newsapi:budget'):
+        self.daily_budget = daily_budget
+        self.capacity = capacity
+        self.refill_rate = daily_budget / 86400.0
+        self.shared = shared
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def _day_key(self):
+        return f"{self.key_prefix}:{datetime.now(dt_timezone.utc):%Y%m%d}"
+
+    def _take_shared(self):
+        cache = caches[self.cache_alias]
+        key = self._day_key()
+        cache.add(key, 0, 86400 + 3600)
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            # Key expired between add() and incr()
+            cache.set(key, 1, 86400 + 3600)
+            used = 1
+        return used <= self.daily_budget
+
+    def acquire(self):
+        """Take one token; return False when the budget is exhausted"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+
+        if self.shared and not self._take_shared():
+            return False
+        return True
+
+    def state(self):
+        with self._lock:
+            self._refill()
+            data = {
+                'tokens': round(self._tokens, 2),
+                'capacity': self.capacity,
+                'daily_budget': self.daily_budget,
+            }
+        if self.shared:
+            data['used_today'] = caches[self.cache_alias].get(self._day_key(), 0)
+        return data
+
+
+class CircuitBreaker:
+    """
+    Stops upstream calls after rate limiting (429) or repeated server errors.
+
+    A 429 opens the breaker immediately (honouring Retry-After); 5xx responses
+    and network errors open it after ``failure_threshold`` consecutive failures.
+    After the cool-down one trial call is let through (half-open): success
+    closes the breaker, failure re-opens it. The open state is mirrored in
+    Django's cache so other processes stop calling too.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, cooldown=60, cache_alias='default',
+                 cache_key='newsapi:breaker'):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.cache_alias = cache_alias
+        self.cache_key = cache_key
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._last_reason = ''
+        self._lock = threading.Lock()
+
+    def _sync_from_cache(self):
+        shared_until = caches[self.cache_alias].get(self.cache_key)
+        if shared_until and shared_until > time.time() and shared_until > self._open_until:
+            self._state = self.OPEN
+            self._open_until = shared_until
+
+    def allow(self):
+        """Return True if a call may go upstream now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                self._sync_from_cache()
+            if self._state == self.OPEN:
+                if time.time() < self._open_until:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def cancel(self):
+        """Give back a half-open trial slot that ended up not being used"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, reason, retry_after=None):
+        with self._lock:
+            self._failures += 1
+            self._last_reason = reason
+            rate_limited = reason == '429'
+            if (rate_limited or self._state == self.HALF_OPEN
+                    or self._failures >= self.failure_threshold):
+                self._open(retry_after if rate_limited and retry_after else self.cooldown)
+
+    def _open(self, seconds):
+        self._state = self.OPEN
+        self._trial_in_flight = False
+        self._open_until = time.time() + seconds
+        caches[self.cache_alias].set(self.cache_key, self._open_until, int(seconds) + 1)
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._state == self.OPEN and time.time() < self._open_until
+
+    def state(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'open_for': max(0, round(self._open_until - time.time(), 1)) if self._state == self.OPEN else 0,
+                'last_failure': self._last_reason,
+            }
@@ -0,0 +1,87 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+
+# Models whose reads may be served from the replica: the article store,
+# activity/session analytics (mostly read by the admin) and profiles
+REPLICA_MODELS = {
+    'article', 'articletag', 'useractivity', 'activityrollup',
+    'loginsession', 'useragent', 'userprofile',
+}
+
+# Cookie holding the time until which a user's reads stay on the primary
+PIN_COOKIE = 'db_primary_until'
+
+_use_primary = ContextVar('use_primary', default=False)
+
+
+class ReplicaRouter:
+    """
+    Send reads of REPLICA_MODELS to the 'replica' database when one is
+    configured; everything else, all writes and all migrations use 'default'.
+
+    Reads inside a transaction on the primary, and reads during a request
+    pinned with pin_to_primary(), stay on the primary so a user always sees
+    their own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            return None
+        if model._meta.app_label != 'trendline' or model._meta.model_name not in REPLICA_MODELS:
+            return None
+        if _use_primary.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so rows from either may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def pin_to_primary(request):
+    """Read from the primary for the rest of this request and the next few seconds"""
+    _use_primary.set(True)
+    request.db_pinned = True
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Keep reads on the primary for clients that wrote recently.
+
+    The pin is a short-lived cookie rather than a session value, so checking
+    it costs no session lookup on requests that never touch the session.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+
+        token = _use_primary.set(pinned_until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+
+        if getattr(request, 'db_pinned', False):
+            seconds = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 45)
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
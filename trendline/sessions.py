@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .models import LoginSession
+
+SWEEP_BATCH_SIZE = 1000
+
+# Session engines that keep a django_session row we can check expiry against
+DB_SESSION_ENGINES = {
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+}
+
+
+def close_stale_sessions(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Close active LoginSessions whose Django session has expired or is gone.
+
+    Walks the open sessions in primary-key batches; each batch costs one
+    SELECT on LoginSession, one on django_session and a single UPDATE for
+    the stale ones. With a session engine that has no session table,
+    sessions older than SESSION_COOKIE_AGE are closed instead. Returns the
+    number of sessions closed. Reads go to the primary, never a replica.
+    """
+    now = timezone.now()
+    use_table = settings.SESSION_ENGINE in DB_SESSION_ENGINES
+    max_login_time = now - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    last_pk = 0
+    closed = 0
+
+    while True:
+        batch = list(
+            LoginSession.objects.using('default')
+            .filter(is_active=True, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'session_key', 'login_time')[:batch_size]
+        )
+        if not batch:
+            return closed
+        last_pk = batch[-1][0]
+
+        if use_table:
+            live = set(
+                Session.objects
+                .filter(session_key__in=[key for _, key, _ in batch if key], expire_date__gt=now)
+                .values_list('session_key', flat=True)
+            )
+            stale = [pk for pk, key, _ in batch if key not in live]
+        else:
+            stale = [pk for pk, _, login_time in batch if login_time < max_login_time]
+
+        if stale:
+            closed += LoginSession.objects.filter(pk__in=stale, is_active=True).update(
+                is_active=False, logout_time=now,
+            )
@@ -1,3 +1,1388 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import importlib
+import json
+import posixpath
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+
+from myproject import urls as root_urls
+
+from . import async_views, urls as trendline_urls
+from .activity import ActivityRecorder, activity_recorder
+from .archive import archive_rows, archived_months, read_archive
+from .avatars import avatar_processor
+from .async_news_client import AsyncNewsAPIClient, async_news_client
+from .backends import EmailOrUsernameBackend
+from .feeds import feed_request, ingest_feed, store_articles, stored_payload
+from .models import Article, ArticleTag, LoginSession, UserActivity, UserAgent, UserProfile
+from .news_client import NewsAPIClient, UpstreamUnavailable, news_client
+from .profiles import profile_cache_key
+from .ratelimit import CircuitBreaker, TokenBucket
+from .routers import PIN_COOKIE, ReplicaRouter, ReplicaStickinessMiddleware, pin_to_primary
+from .sessions import close_stale_sessions
+
+try:
+    import httpx
+except ImportError:  # only needed by the async client
+    httpx = None
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """The lookups behind logout, timelines and the admin use their indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', 'planner@example.com', 'pw')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_logout_session_lookup(self):
+        self.assertUsesIndex(
+            LoginSession.objects.filter(user=self.user, session_key='abc', is_active=True)
+            .order_by('-login_time'),
+            'loginsession_user_key_idx',
+        )
+
+    def test_user_activity_timeline(self):
+        self.assertUsesIndex(
+            UserActivity.objects.filter(user=self.user).order_by('-timestamp'),
+            'activity_user_time_idx',
+        )
+
+    def test_activity_type_filter(self):
+        self.assertUsesIndex(
+            UserActivity.objects.filter(activity_type='LOGIN').order_by('-timestamp'),
+            'activity_type_time_idx',
+        )
+
+    def test_login_session_admin_ordering(self):
+        self.assertUsesIndex(LoginSession.objects.order_by('-login_time'), 'loginsession_login_time_idx')
+
+    def test_open_sessions_sweep(self):
+        self.assertUsesIndex(
+            LoginSession.objects.filter(is_active=True, login_time__lt=timezone.now()),
+            'loginsession_active_idx',
+        )
+
+    def test_email_lookup(self):
+        self.assertUsesIndex(
+            User.objects.filter(email__lower='Planner@Example.com'.lower()),
+            'auth_user_email_lower_idx',
+        )
+
+    def test_login_lookup(self):
+        plan = EmailOrUsernameBackend().candidates('Planner@Example.com').explain()
+        self.assertIn('auth_user_email_lower_idx', plan)
+        self.assertIn('MULTI-INDEX OR', plan)
+        self.assertIn('(username=?)', plan)
+        self.assertNotIn('SCAN auth_user', plan)
+
+
+class DuplicateEmailTests(TestCase):
+    """Changing email to another account's address (in any case) is a 400"""
+
+    def setUp(self):
+        # Write activities inline, inside the test transaction
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        User.objects.create_user('first', 'taken@example.com', 'pw')
+        self.user = User.objects.create_user('second', 'mine@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def test_profile_api(self):
+        response = self.client.post(
+            '/api/profile/update/', json.dumps({'email': 'Taken@Example.com'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'mine@example.com')
+
+    def test_own_address_in_other_case(self):
+        response = self.client.post(
+            '/api/profile/update/', json.dumps({'email': 'Mine@example.com'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class LoginQueryTests(TestCase):
+    """A login runs a fixed, small set of statements"""
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('login', 'login@example.com', 'pw')
+
+    def test_login_statements(self):
+        # User (with profile) lookup; in one savepoint: session key check,
+        # session INSERT, last_login UPDATE, LoginSession INSERT; the LOGIN
+        # activity INSERT; the session middleware's UPDATE. Savepoints count.
+        with self.assertNumQueries(13) as queries:
+            response = self.client.post('/login/', {'username': 'Login@Example.com', 'password': 'pw'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(LoginSession.objects.filter(user=self.user, is_active=True).exists())
+        # The profile check reads the relation the backend already loaded
+        self.assertFalse(any(
+            'FROM "trendline_userprofile"' in query['sql'] for query in queries.captured_queries
+        ))
+
+
+class ProfileSignalQueryTests(TestCase):
+    """User saves only touch the profile when a profile field changed"""
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('signal', 'signal@example.com', 'pw')
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def test_last_login_save(self):
+        # login()'s update_last_login: the profile is left alone
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_full_save(self):
+        # The user UPDATE plus one UPDATE of profile.updated_at, no profile SELECT
+        with self.assertNumQueries(2) as queries:
+            self.user.save()
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT') for query in queries.captured_queries
+        ))
+
+    def test_profile_update_api(self):
+        self.client.force_login(self.user)
+        # Session, user and profile reads; in one savepoint the user UPDATE,
+        # the signal's updated_at UPDATE and the profile UPDATE; the activity INSERT
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                '/api/profile/update/', json.dumps({'first_name': 'New', 'bio': 'Hello'}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['profile']['bio'], 'Hello')
+
+
+def open_breaker(test):
+    """Open the NewsAPI circuit breaker for the rest of a test"""
+    cache.clear()
+    test.addCleanup(cache.clear)
+    # A configured deployment whose upstream is blocked
+    patcher = mock.patch.object(news_client, 'api_key', 'test-key')
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    news_client.breaker.record_failure('429', retry_after=60)
+    test.addCleanup(news_client.breaker.record_success)
+
+
+@skipUnless(news_client.breaker is not None, 'needs the NewsAPI circuit breaker')
+class NewsWhileUpstreamDownTests(TestCase):
+    """News endpoints answer with an empty list instead of a 500 when NewsAPI is blocked"""
+
+    def setUp(self):
+        open_breaker(self)
+
+    def test_get_news(self):
+        response = self.client.get('/get-news/politics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['articles'], [])
+        self.assertIn('circuit breaker', response.json()['message'])
+
+    def test_async_get_news(self):
+        response = async_to_sync(async_views.get_news)(RequestFactory().get('/get-news/politics/'), 'politics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['articles'], [])
+
+
+@skipUnless(news_client.breaker is not None, 'needs the NewsAPI circuit breaker')
+class ChatWhileUpstreamDownTests(TestCase):
+    """With the breaker open, chat still answers from the local article store"""
+
+    def setUp(self):
+        open_breaker(self)
+
+        store_articles([{
+            'url': 'https://example.com/monsoon',
+            'title': 'Monsoon reaches Kerala early',
+            'description': 'Rainfall arrives a week ahead of schedule.',
+            'publishedAt': '2026-06-01T08:00:00Z',
+            'source': {'name': 'Example'},
+        }], 'all')
+
+    def chat(self, message):
+        response = self.client.post('/api/chat/', json.dumps({'message': message}),
+                                    content_type='application/json')
+        return response.json()['bot_response']
+
+    def test_answers_from_local_index(self):
+        self.assertIn('Monsoon reaches Kerala early', self.chat('monsoon kerala'))
+
+    def test_reports_upstream_when_nothing_local(self):
+        self.assertIn('API Connection Issue', self.chat('quantum chromodynamics'))
+
+
+class UnbufferedRollupTests(TestCase):
+    """Unbuffered rollups are written on the request thread without closing its connection"""
+
+    def test_connection_kept_inside_atomic(self):
+        user = User.objects.create_user('rollup', 'rollup@example.com', 'pw')
+        with mock.patch.object(activity_recorder, 'enabled', False), \
+                mock.patch.object(activity_recorder, 'rollup_types', {'DASHBOARD_VIEW'}), \
+                mock.patch('trendline.activity.close_old_connections') as close:
+            activity_recorder.record(user=user, activity_type='DASHBOARD_VIEW')
+
+        close.assert_not_called()
+        self.assertEqual(user.activity_rollups.get().count, 1)
+
+
+class FakeClock:
+    """Stands in for the time module; advance() moves both clocks"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.clock = FakeClock()
+        patcher = mock.patch('trendline.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(daily_budget=8640, capacity=3)  # one token per 10 s
+        self.assertEqual([bucket.acquire() for _ in range(4)], [True, True, True, False])
+
+        self.clock.advance(9)
+        self.assertFalse(bucket.acquire())
+        self.clock.advance(1)
+        self.assertTrue(bucket.acquire())
+
+    def test_refill_capped_at_capacity(self):
+        bucket = TokenBucket(daily_budget=8640, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.advance(3600)
+        self.assertEqual(bucket.state()['tokens'], 2)
+
+    def test_shared_daily_counter(self):
+        # Two processes' buckets with plenty of burst share one daily quota
+        first = TokenBucket(daily_budget=3, capacity=10, shared=True)
+        second = TokenBucket(daily_budget=3, capacity=10, shared=True)
+        self.assertEqual(
+            [first.acquire(), second.acquire(), first.acquire(), second.acquire()],
+            [True, True, True, False],
+        )
+        self.assertEqual(first.state()['used_today'], 4)
+
+
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.clock = FakeClock()
+        patcher = mock.patch('trendline.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, cooldown=60, cache_key='test:breaker')
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure('503')
+        self.breaker.record_failure('503')
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()  # resets the streak
+        for _ in range(3):
+            self.breaker.record_failure('503')
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_trial_closes_on_success(self):
+        for _ in range(3):
+            self.breaker.record_failure('503')
+        self.clock.advance(60)
+
+        self.assertTrue(self.breaker.allow())   # the single trial call
+        self.assertFalse(self.breaker.allow())  # others wait for it
+        self.assertEqual(self.breaker.state()['state'], CircuitBreaker.HALF_OPEN)
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state()['state'], CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_trial_failure_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure('503')
+        self.clock.advance(60)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure('503')
+        self.assertTrue(self.breaker.is_open)
+        self.assertEqual(self.breaker.state()['open_for'], 60)
+
+    def test_cancelled_trial_frees_the_slot(self):
+        self.breaker.record_failure('429')
+        self.clock.advance(60)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.cancel()
+        self.assertTrue(self.breaker.allow())
+
+    def test_429_honours_retry_after(self):
+        self.breaker.record_failure('429', retry_after=300)
+        self.assertTrue(self.breaker.is_open)
+        self.clock.advance(299)
+        self.assertFalse(self.breaker.allow())
+        self.clock.advance(1)
+        self.assertTrue(self.breaker.allow())
+
+    def test_open_state_shared_between_processes(self):
+        self.breaker.record_failure('429', retry_after=120)
+        other = CircuitBreaker(failure_threshold=3, cooldown=60, cache_key='test:breaker')
+        self.assertFalse(other.allow())
+
+    def test_client_reads_retry_after_header(self):
+        client = NewsAPIClient('key', breaker=self.breaker)
+        client.after_response(429, {'Retry-After': '90'})
+        self.assertEqual(self.breaker.state()['open_for'], 90)
+
+
+def api_article(n, **fields):
+    """A NewsAPI-shaped article"""
+    article = {
+        'source': {'id': None, 'name': 'Wire'},
+        'author': None,
+        'title': f'Story {n}',
+        'description': f'About story {n}',
+        'url': f'https://example.com/{n}',
+        'urlToImage': None,
+        'publishedAt': f'2026-01-{n:02d}T10:00:00Z',
+        'content': None,
+    }
+    article.update(fields)
+    return article
+
+
+class ArticleStoreTests(TestCase):
+
+    def test_store_articles_upserts_and_tags(self):
+        self.assertEqual(store_articles([api_article(1), api_article(2)], 'sports'), 2)
+        stored = store_articles([api_article(1, title='Story 1, updated')], 'trending')
+
+        self.assertEqual(stored, 1)
+        self.assertEqual(Article.objects.count(), 2)
+        article = Article.objects.get(url='https://example.com/1')
+        self.assertEqual(article.title, 'Story 1, updated')
+        self.assertEqual(set(article.tags.values_list('name', flat=True)), {'sports', 'trending'})
+
+    def test_store_articles_skips_removed_and_untitled(self):
+        stored = store_articles(
+            [api_article(1, title='[Removed]'), api_article(2, url=None), api_article(3, title='')],
+            'sports',
+        )
+        self.assertEqual(stored, 0)
+        self.assertFalse(Article.objects.exists())
+
+    def test_ingest_feed_uses_the_feed_request(self):
+        endpoint, params = feed_request('recent-india')
+        payload = {'status': 'ok', 'articles': [api_article(1)]}
+        with mock.patch.object(news_client, 'get_json', return_value=payload) as get_json:
+            self.assertEqual(ingest_feed('recent-india'), 1)
+        get_json.assert_called_once_with(endpoint, params)
+        self.assertTrue(ArticleTag.objects.filter(name='recent-india').exists())
+
+    def test_ingest_feed_error_stores_nothing(self):
+        payload = {'status': 'error', 'message': 'rateLimited'}
+        with mock.patch.object(news_client, 'get_json', return_value=payload):
+            self.assertEqual(ingest_feed('sports'), 0)
+        self.assertFalse(Article.objects.exists())
+
+    def test_stored_payload_newest_first(self):
+        store_articles([api_article(n) for n in (3, 1, 2)], 'sports')
+        payload = stored_payload('sports', limit=2)
+
+        self.assertEqual(payload['totalResults'], 2)
+        self.assertEqual([a['title'] for a in payload['articles']], ['Story 3', 'Story 2'])
+        self.assertIsNone(stored_payload('politics'))
+
+    def test_stored_payload_ignores_stale_feeds(self):
+        store_articles([api_article(1)], 'sports')
+        with self.settings(NEWS_STORE_MAX_AGE=60):
+            ArticleTag.objects.update(seen_at=timezone.now() - timedelta(seconds=61))
+            self.assertIsNone(stored_payload('sports'))
+
+
+class StoredEndpointTests(TestCase):
+    """The standalone trending, recent and advanced endpoints read the store first"""
+
+    def setUp(self):
+        patcher = mock.patch.object(news_client, 'fetch', side_effect=AssertionError('upstream call'))
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_recent_from_store(self):
+        store_articles([api_article(1)], 'recent-india')
+        response = self.client.get('/api/recent/')
+        self.assertEqual(response.json()['recent'][0]['title'], 'Story 1')
+
+    def test_trending_from_store(self):
+        store_articles([api_article(1)], 'trending-wide')
+        response = self.client.get('/api/trending/')
+        self.assertEqual(response.json()['trending'][0]['title'], 'Story 1')
+
+    def test_advanced_trending_from_store(self):
+        store_articles([api_article(1)], 'advanced-popular')
+        store_articles([api_article(2)], 'advanced-keyword')
+        response = self.client.get('/api/trending/advanced/')
+        self.assertEqual([a['title'] for a in response.json()['trending']], ['Story 1', 'Story 2'])
+
+    def test_live_fallback_matches_ingested_request(self):
+        self.fetch.side_effect = None
+        self.fetch.return_value = {'status': 'ok', 'articles': []}
+        self.client.get('/api/trending/')
+        self.fetch.assert_called_once_with(*feed_request('trending-wide'))
+
+
+class SidebarFallbackTests(TestCase):
+    """The no-country headlines are only requested when recent news is empty"""
+
+    def setUp(self):
+        patcher = mock.patch.object(news_client, 'fetch')
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetched(self):
+        return [(endpoint, params.get('country')) for (endpoint, params), _ in self.fetch.call_args_list]
+
+    def test_no_fallback_when_recent_has_news(self):
+        self.fetch.return_value = {'status': 'ok', 'articles': [api_article(1)]}
+        response = self.client.get('/api/sidebar/')
+
+        self.assertEqual(response.json()['sidebar']['recent'][0]['title'], 'Story 1')
+        self.assertEqual(self.fetch.call_count, 2)
+        self.assertNotIn(('top-headlines', None), self.fetched())
+
+    def test_fallback_when_recent_is_empty(self):
+        def fetch(endpoint, params):
+            if endpoint == 'top-headlines' and 'country' not in params:
+                return {'status': 'ok', 'articles': [api_article(2)]}
+            return {'status': 'ok', 'articles': []}
+        self.fetch.side_effect = fetch
+
+        response = self.client.get('/api/sidebar/')
+        self.assertEqual(response.json()['sidebar']['recent'][0]['title'], 'Story 2')
+        self.assertIn(('top-headlines', None), self.fetched())
+
+    def test_fallback_when_recent_fails(self):
+        def fetch(endpoint, params):
+            if 'country' in params:
+                raise requests.ConnectionError('down')
+            return {'status': 'ok', 'articles': [api_article(3)]}
+        self.fetch.side_effect = fetch
+
+        response = self.client.get('/api/sidebar/')
+        self.assertEqual(response.json()['sidebar']['recent'][0]['title'], 'Story 3')
+
+    def test_async_sidebar_skips_fallback(self):
+        async def fetch(endpoint, params):
+            calls.append((endpoint, params.get('country')))
+            return {'status': 'ok', 'articles': [api_article(1)]}
+        calls = []
+        with mock.patch.object(async_news_client, 'fetch', fetch):
+            response = async_to_sync(async_views.get_sidebar_data)(RequestFactory().get('/api/sidebar/'))
+
+        self.assertEqual(json.loads(response.content)['sidebar']['recent'][0]['title'], 'Story 1')
+        self.assertEqual(len(calls), 2)
+        self.assertNotIn(('top-headlines', None), calls)
+
+
+class ProfileCacheTests(TestCase):
+    """The profile API's ETag and the cache entry it is computed from"""
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def get_profile(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/profile/', **headers)
+
+    def test_not_modified(self):
+        response = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+
+        again = self.get_profile(response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_update_changes_etag(self):
+        etag = self.get_profile()['ETag']
+        self.client.post(
+            '/api/profile/update/', json.dumps({'bio': 'Changed'}), content_type='application/json',
+        )
+
+        response = self.get_profile(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['profile']['bio'], 'Changed')
+
+    def test_profile_save_invalidates(self):
+        self.get_profile()
+        self.assertIsNotNone(cache.get(profile_cache_key(self.user.pk)))
+
+        self.user.userprofile.location = 'Pune'
+        self.user.userprofile.save()
+        self.assertIsNone(cache.get(profile_cache_key(self.user.pk)))
+        self.assertEqual(self.get_profile().json()['profile']['location'], 'Pune')
+
+    def test_user_save_invalidates_only_for_profile_fields(self):
+        self.get_profile()
+        self.user.save(update_fields=['last_login'])
+        self.assertIsNotNone(cache.get(profile_cache_key(self.user.pk)))
+
+        self.user.first_name = 'Renamed'
+        self.user.save(update_fields=['first_name'])
+        self.assertIsNone(cache.get(profile_cache_key(self.user.pk)))
+
+    def test_profile_delete_invalidates(self):
+        self.get_profile()
+        self.user.userprofile.delete()
+        self.assertIsNone(cache.get(profile_cache_key(self.user.pk)))
+
+
+class ActivityRecorderTests(TestCase):
+    """The write-behind buffer, driven from the test thread (no writer thread)"""
+
+    def setUp(self):
+        # Start each test with an empty User-Agent id cache
+        patcher = mock.patch.object(UserAgent, '_ids', OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('recorder', 'recorder@example.com', 'pw')
+
+    def recorder(self, **options):
+        recorder = ActivityRecorder(**options)
+        patcher = mock.patch.object(recorder, '_ensure_writer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return recorder
+
+    def record(self, recorder, count, activity_type='DASHBOARD_VIEW'):
+        for _ in range(count):
+            recorder.record(user=self.user, activity_type=activity_type, user_agent='Test/1.0')
+
+    def test_buffered_until_flush(self):
+        recorder = self.recorder(batch_size=2)
+        self.record(recorder, 5)
+        self.assertFalse(UserActivity.objects.exists())
+
+        recorder.flush()
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 5)
+        stats = recorder.stats()
+        self.assertEqual((stats['written'], stats['flushes'], stats['buffered']), (5, 3, 0))
+
+    def test_queue_is_bounded(self):
+        recorder = self.recorder(max_queue=2)
+        self.record(recorder, 3)
+
+        stats = recorder.stats()
+        self.assertEqual((stats['queued'], stats['dropped'], stats['buffered']), (2, 1, 2))
+        recorder.flush()
+        self.assertEqual(UserActivity.objects.count(), 2)
+
+    def test_stop_flushes(self):
+        recorder = self.recorder()
+        self.record(recorder, 2)
+        self.record(recorder, 1, activity_type='OTHER')
+
+        recorder.stop()
+        self.assertEqual(UserActivity.objects.count(), 3)
+        self.assertEqual(recorder.stats()['buffered'], 0)
+
+    def test_disabled_writes_inline(self):
+        recorder = self.recorder(enabled=False)
+        self.record(recorder, 2)
+
+        self.assertEqual(UserActivity.objects.count(), 2)
+        self.assertEqual(recorder.stats()['written'], 2)
+        self.assertEqual(recorder.stats()['buffered'], 0)
+        recorder._ensure_writer.assert_not_called()
+
+    def test_rollups_summed_on_flush(self):
+        recorder = self.recorder(rollup_types=['DASHBOARD_VIEW', 'LOGIN'])
+        self.record(recorder, 3)
+        self.record(recorder, 1, activity_type='LOGIN')  # exact types are never rolled up
+
+        recorder.flush()
+        self.assertEqual(self.user.activity_rollups.get().count, 3)
+        self.assertEqual(list(UserActivity.objects.values_list('activity_type', flat=True)), ['LOGIN'])
+
+    def test_sampling(self):
+        recorder = self.recorder(sample_rates={'DASHBOARD_VIEW': 0.5})
+        with mock.patch('trendline.activity.random.random', side_effect=[0.7, 0.2]):
+            self.record(recorder, 2)
+        recorder.flush()
+
+        self.assertEqual(recorder.stats()['sampled_out'], 1)
+        self.assertEqual(UserActivity.objects.get().metadata, {'sample_rate': 0.5})
+
+
+class NewsClientCacheTests(TestCase):
+    """Single-flight misses and stale-while-revalidate in NewsAPIClient.fetch"""
+
+    PARAMS = {'q': 'India', 'language': 'en'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client_ = NewsAPIClient('key', pool_size=4)
+        self.addCleanup(lambda: self.client_.executor.shutdown(wait=True))
+
+    def payload(self, title):
+        return {'status': 'ok', 'totalResults': 1, 'articles': [api_article(1, title=title)]}
+
+    def test_concurrent_misses_share_one_call(self):
+        release = threading.Event()
+
+        def get_json(endpoint, params):
+            release.wait(5)
+            return self.payload('Fresh')
+
+        key = self.client_.cache_key('everything', self.PARAMS)
+        with mock.patch.object(self.client_, 'get_json', side_effect=get_json) as upstream:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                futures = [pool.submit(self.client_.fetch, 'everything', self.PARAMS) for _ in range(8)]
+                # Let the first call through once every caller is queued on the key
+                deadline = time.monotonic() + 5
+                while self.client_._flights.get(key, [None, 0])[1] < 8 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                release.set()
+                results = [future.result(5) for future in futures]
+
+        upstream.assert_called_once()
+        self.assertTrue(all(result['articles'][0]['title'] == 'Fresh' for result in results))
+        self.assertEqual(self.client_.stats()['coalesced'], 7)
+
+    def test_stale_served_while_refreshing_on_executor(self):
+        key = self.client_.cache_key('everything', self.PARAMS)
+        cache.set(key, {'data': self.payload('Stale'), 'expires_at': time.time() - 1}, 60)
+        threads = []
+
+        def get_json(endpoint, params):
+            threads.append(threading.current_thread().name)
+            return self.payload('Fresh')
+
+        with mock.patch.object(self.client_, 'get_json', side_effect=get_json):
+            first = self.client_.fetch('everything', self.PARAMS)
+            self.client_.executor.shutdown(wait=True)
+
+        self.assertEqual(first['articles'][0]['title'], 'Stale')
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('newsapi_'))  # an executor worker
+        self.assertEqual(cache.get(key)['data']['articles'][0]['title'], 'Fresh')
+        self.assertEqual(self.client_.stats()['refreshes'], 1)
+
+    def test_one_refresh_per_stale_key(self):
+        key = self.client_.cache_key('everything', self.PARAMS)
+        cache.set(key, {'data': self.payload('Stale'), 'expires_at': time.time() - 1}, 60)
+        release = threading.Event()
+
+        def get_json(endpoint, params):
+            release.wait(5)
+            return self.payload('Fresh')
+
+        with mock.patch.object(self.client_, 'get_json', side_effect=get_json) as upstream:
+            for _ in range(5):
+                self.assertEqual(self.client_.fetch('everything', self.PARAMS)['articles'][0]['title'], 'Stale')
+            release.set()
+            self.client_.executor.shutdown(wait=True)
+        upstream.assert_called_once()
+
+    def test_no_refresh_while_breaker_open(self):
+        client = NewsAPIClient('key', breaker=CircuitBreaker(cache_key='test:breaker'))
+        client.breaker.record_failure('429', retry_after=60)
+        key = client.cache_key('everything', self.PARAMS)
+        cache.set(key, {'data': self.payload('Stale'), 'expires_at': time.time() - 1}, 60)
+
+        with mock.patch.object(client, 'get_json') as upstream:
+            self.assertEqual(client.fetch('everything', self.PARAMS)['articles'][0]['title'], 'Stale')
+        upstream.assert_not_called()
+        self.assertIsNone(client._executor)
+
+
+class NewsClientSessionTests(TestCase):
+    """The pooled session, request plumbing and response caching of NewsAPIClient"""
+
+    PARAMS = {'q': 'India', 'language': 'en'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client_ = NewsAPIClient('secret', pool_size=7, max_retries=3, backoff_factor=0.25)
+
+    def mock_session(self, payload, status_code=200):
+        """The client's real pooled session, with get() answering from memory"""
+        session = self.client_.session
+        patcher = mock.patch.object(session, 'get')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        session.get.return_value.status_code = status_code
+        session.get.return_value.headers = {}
+        session.get.return_value.json.return_value = payload
+        return session
+
+    def test_pooled_session(self):
+        session = self.client_.session
+        self.assertIs(self.client_.session, session)  # built once per client
+
+        adapter = session.get_adapter('https://newsapi.org/v2/everything')
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertTrue(adapter._pool_block)
+        retry = adapter.max_retries
+        self.assertEqual((retry.total, retry.connect, retry.read), (3, 3, 3))
+        self.assertEqual(retry.backoff_factor, 0.25)
+        self.assertEqual(set(retry.status_forcelist), {502, 503, 504})
+        self.assertEqual(retry.allowed_methods, frozenset(['GET']))
+        self.assertFalse(retry.raise_on_status)
+        self.assertEqual(session.headers['X-Api-Key'], 'secret')
+
+    def test_missing_api_key(self):
+        client = NewsAPIClient(None)
+        with self.assertRaisesMessage(ImproperlyConfigured, 'NEWS_API_KEY'):
+            client.get_json('everything', self.PARAMS)
+        self.assertIsNone(client._session)
+
+    def test_key_sent_as_header_not_param(self):
+        session = self.mock_session({'status': 'ok', 'articles': []})
+        self.client_.get_json('everything', {**self.PARAMS, 'apiKey': 'leak', 'page': None})
+
+        session.get.assert_called_once_with(
+            'https://newsapi.org/v2/everything', params=self.PARAMS, timeout=self.client_.timeout,
+        )
+
+    def test_cache_key(self):
+        key = self.client_.cache_key('everything', {'q': 'India', 'language': 'en'})
+        self.assertEqual(key, self.client_.cache_key('everything', {'language': 'en', 'q': 'India', 'apiKey': 'x'}))
+        self.assertEqual(key, self.client_.cache_key('/everything/', {'q': 'India', 'language': 'en', 'page': None}))
+        self.assertNotEqual(key, self.client_.cache_key('top-headlines', {'q': 'India', 'language': 'en'}))
+        self.assertNotEqual(key, self.client_.cache_key('everything', {'q': 'India', 'language': 'fr'}))
+        self.assertTrue(key.startswith('newsapi:everything:'))
+
+    def test_fetch_caches_ok_payload_for_endpoint_ttl(self):
+        session = self.mock_session({'status': 'ok', 'articles': []})
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client_.fetch('top-headlines', {'country': 'in'})
+            self.client_.fetch('top-headlines', {'country': 'in'})
+
+        session.get.assert_called_once()
+        (key, entry, timeout), _ = cache_set.call_args
+        self.assertEqual(key, self.client_.cache_key('top-headlines', {'country': 'in'}))
+        self.assertEqual(timeout, 120 + self.client_.stale_ttl)
+        self.assertAlmostEqual(entry['expires_at'], time.time() + 120, delta=5)
+        stats = self.client_.stats()
+        self.assertEqual((stats['cache_misses'], stats['cache_hits']), (1, 1))
+
+    def test_errors_not_cached(self):
+        session = self.mock_session({'status': 'error', 'code': 'rateLimited'})
+        self.client_.fetch('everything', self.PARAMS)
+        self.client_.fetch('everything', self.PARAMS)
+        self.assertEqual(session.get.call_count, 2)
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    """Who EmailOrUsernameBackend lets in, and with how many password hashes"""
+
+    def setUp(self):
+        self.backend = EmailOrUsernameBackend()
+        self.user = User.objects.create_user('alice', 'Alice@Example.com', 'pw')
+
+    def authenticate(self, username, password='pw'):
+        with mock.patch('django.contrib.auth.hashers.pbkdf2', wraps=hashers.pbkdf2) as pbkdf2:
+            user = self.backend.authenticate(None, username=username, password=password)
+        self.assertEqual(pbkdf2.call_count, 1)  # one hash, whatever the outcome
+        return user
+
+    def test_username_or_email(self):
+        self.assertEqual(self.authenticate('alice'), self.user)
+        self.assertEqual(self.authenticate('alice@example.com'), self.user)
+
+    def test_wrong_password(self):
+        self.assertIsNone(self.authenticate('alice', 'nope'))
+        self.assertIsNone(self.authenticate('ALICE@example.com', 'nope'))
+
+    def test_unknown_user(self):
+        self.assertIsNone(self.authenticate('nobody@example.com'))
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.authenticate('alice'))
+
+    def test_duplicate_case_email(self):
+        # The LOWER(email) unique index keeps any-case email logins unambiguous
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('alice2', 'alice@example.com', 'other')
+        self.assertEqual(self.authenticate('ALICE@EXAMPLE.COM'), self.user)
+
+    def test_exact_username_beats_email(self):
+        # Someone whose username is another account's email address
+        squatter = User.objects.create_user('alice@example.com', 'squat@example.com', 'squat')
+        self.assertEqual(self.authenticate('alice@example.com', 'squat'), squatter)
+        self.assertIsNone(self.authenticate('alice@example.com'))
+
+    def test_login_view_with_email(self):
+        with mock.patch.object(activity_recorder, 'enabled', False):
+            response = self.client.post('/login/', {'username': 'ALICE@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+
+@skipUnless(httpx is not None, 'the async client needs httpx')
+class AsyncNewsClientTests(TestCase):
+    """AsyncNewsAPIClient against an in-memory httpx transport"""
+
+    PARAMS = {'q': 'India', 'language': 'en'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.sync_client = NewsAPIClient('secret', breaker=CircuitBreaker(cache_key='test:breaker'))
+        self.async_client = AsyncNewsAPIClient(self.sync_client)
+        self.requests = []
+        self.respond = lambda request: httpx.Response(200, json={'status': 'ok', 'articles': [api_article(1)]})
+
+        async def handler(request):
+            self.requests.append(request)
+            await asyncio.sleep(0.01)
+            return self.respond(request)
+
+        # Keep the real client setup (base URL, headers, limits); swap only the network
+        patcher = mock.patch.object(httpx, 'AsyncHTTPTransport', lambda **kwargs: httpx.MockTransport(handler))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_fetch(self):
+        data = await self.async_client.fetch('everything', {**self.PARAMS, 'apiKey': 'leak'})
+
+        self.assertEqual(data['articles'][0]['title'], 'Story 1')
+        request = self.requests[0]
+        self.assertEqual(request.url.path, '/v2/everything')
+        self.assertEqual(dict(request.url.params), self.PARAMS)
+        self.assertEqual(request.headers['X-Api-Key'], 'secret')
+
+    async def test_cached_and_shared_with_sync_client(self):
+        await self.async_client.fetch('everything', self.PARAMS)
+        await self.async_client.fetch('everything', self.PARAMS)
+        self.assertEqual(len(self.requests), 1)
+        self.assertIsNotNone(cache.get(self.sync_client.cache_key('everything', self.PARAMS)))
+
+    async def test_concurrent_misses_share_one_request(self):
+        results = await asyncio.gather(*(self.async_client.fetch('everything', self.PARAMS) for _ in range(5)))
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertEqual(self.sync_client.stats()['coalesced'], 4)
+
+    async def test_retry_after_opens_breaker(self):
+        self.respond = lambda request: httpx.Response(
+            429, headers={'Retry-After': '120'}, json={'status': 'error', 'code': 'rateLimited'},
+        )
+        data = await self.async_client.fetch('everything', self.PARAMS)
+
+        self.assertEqual(data['code'], 'rateLimited')
+        self.assertEqual(self.sync_client.breaker.state()['open_for'], 120)
+        with self.assertRaises(UpstreamUnavailable):
+            await self.async_client.fetch('everything', self.PARAMS)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_network_errors_become_requests_errors(self):
+        def fail(request):
+            raise httpx.ConnectError('refused', request=request)
+        self.respond = fail
+
+        with self.assertRaises(requests.ConnectionError):
+            await self.async_client.fetch('everything', self.PARAMS)
+
+    async def test_fetch_many_reports_failures_as_none(self):
+        def respond(request):
+            if request.url.params.get('q') == 'bad':
+                raise httpx.ConnectError('refused', request=request)
+            return httpx.Response(200, json={'status': 'ok', 'articles': []})
+        self.respond = respond
+
+        results = await self.async_client.fetch_many({
+            'good': ('everything', {'q': 'good'}),
+            'bad': ('everything', {'q': 'bad'}),
+        })
+        self.assertEqual(results, {'good': {'status': 'ok', 'articles': []}, 'bad': None})
+
+
+class AsyncViewsRoutingTests(TestCase):
+    """NEWS_ASYNC_VIEWS swaps the news endpoints for the async views"""
+
+    def route(self, async_views_enabled):
+        # urls.py picks the views at import time, and the root URLconf keeps
+        # the patterns it included
+        with self.settings(NEWS_ASYNC_VIEWS=async_views_enabled):
+            importlib.reload(trendline_urls)
+        importlib.reload(root_urls)
+        clear_url_caches()
+
+    def setUp(self):
+        self.addCleanup(self.route, settings.NEWS_ASYNC_VIEWS)
+
+    def test_async_routing(self):
+        self.route(True)
+        for url in ('/get-news/sports/', '/api/trending/', '/api/recent/', '/api/sidebar/', '/api/chat/'):
+            with self.subTest(url=url):
+                func = resolve(url).func
+                self.assertEqual(func.__module__, 'trendline.async_views')
+                self.assertTrue(iscoroutinefunction(func))
+        # Endpoints without an async version stay on the sync views
+        self.assertEqual(resolve('/api/trending/advanced/').func.__module__, 'trendline.views')
+
+    def test_sync_routing(self):
+        self.route(False)
+        self.assertEqual(resolve('/api/sidebar/').func.__module__, 'trendline.views')
+
+    def test_async_view_through_client(self):
+        self.route(True)
+        store_articles([api_article(1)], 'trending-wide')
+        with mock.patch.object(news_client, 'fetch', side_effect=AssertionError('upstream call')):
+            response = self.client.get('/api/trending/')
+        self.assertEqual(response.json()['trending'][0]['title'], 'Story 1')
+
+
+class UserAgentTests(TestCase):
+    """UserAgent.id_for: one row per distinct string, ids cached once committed"""
+
+    def setUp(self):
+        patcher = mock.patch.object(UserAgent, '_ids', OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def id_for(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserAgent.id_for(value)
+
+    def test_dedup(self):
+        first = self.id_for('Mozilla/5.0')
+        UserAgent._ids.clear()
+        self.assertEqual(self.id_for('Mozilla/5.0'), first)
+        self.assertNotEqual(self.id_for('curl/8.0'), first)
+        self.assertEqual(UserAgent.objects.count(), 2)
+        self.assertIsNone(UserAgent.id_for(''))
+
+    def test_cache_hit_needs_no_query(self):
+        ua_id = self.id_for('Mozilla/5.0')
+        with self.assertNumQueries(0):
+            self.assertEqual(UserAgent.id_for('Mozilla/5.0'), ua_id)
+
+    def test_least_recently_used_evicted(self):
+        with mock.patch.object(UserAgent, 'CACHE_SIZE', 2):
+            for value in ('a/1', 'b/1', 'a/1', 'c/1'):
+                self.id_for(value)
+        self.assertEqual(list(UserAgent._ids), ['a/1', 'c/1'])
+
+    def test_uncommitted_ids_not_cached(self):
+        # Created and then looked up again in a transaction that rolls back
+        with self.captureOnCommitCallbacks(execute=False), transaction.atomic():
+            UserAgent.id_for('Mozilla/5.0')
+            UserAgent.id_for('Mozilla/5.0')
+            transaction.set_rollback(True)
+        self.assertEqual(UserAgent._ids, {})
+
+
+class UserAgentBackfillTests(TransactionTestCase):
+    """Migration 0009 moves the User-Agent strings into UserAgent rows"""
+
+    before = [('trendline', '0008_user_email_lower_index')]
+    after = [('trendline', '0009_useragent')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_backfill(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username='backfill')
+        LoginSession = apps.get_model('trendline', 'LoginSession')
+        UserActivity = apps.get_model('trendline', 'UserActivity')
+        LoginSession.objects.create(user_id=user.pk, user_agent='Mozilla/5.0')
+        LoginSession.objects.create(user_id=user.pk, user_agent='')
+        UserActivity.objects.create(user_id=user.pk, activity_type='LOGIN', user_agent='Mozilla/5.0')
+        UserActivity.objects.create(user_id=user.pk, activity_type='LOGIN', user_agent='curl/8.0')
+
+        apps = self.migrate(self.after)
+        agents = apps.get_model('trendline', 'UserAgent').objects
+        self.assertEqual(sorted(agents.values_list('value', flat=True)), ['Mozilla/5.0', 'curl/8.0'])
+        mozilla = agents.get(value='Mozilla/5.0')
+        self.assertEqual(mozilla.ua_hash, UserAgent.hash_value('Mozilla/5.0'))
+        self.assertEqual(
+            set(apps.get_model('trendline', 'LoginSession').objects.values_list('user_agent_id', flat=True)),
+            {None, mozilla.pk},
+        )
+        self.assertEqual(
+            set(apps.get_model('trendline', 'UserActivity').objects.values_list('user_agent__value', flat=True)),
+            {'Mozilla/5.0', 'curl/8.0'},
+        )
+
+        # And back: the strings are restored from the references
+        apps = self.migrate(self.before)
+        self.assertEqual(
+            sorted(apps.get_model('trendline', 'UserActivity').objects.values_list('user_agent', flat=True)),
+            ['Mozilla/5.0', 'curl/8.0'],
+        )
+
+
+class ArchiveTests(TestCase):
+    """archive_rows moves old rows into monthly files that read_archive reads back"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.user = User.objects.create_user('archived', 'archived@example.com', 'pw')
+        self.ua_id = UserAgent.objects.create(ua_hash=UserAgent.hash_value('Mozilla/5.0'), value='Mozilla/5.0').pk
+
+    def test_round_trip(self):
+        january = timezone.make_aware(datetime(2026, 1, 15, 12))
+        february = timezone.make_aware(datetime(2026, 2, 3, 8))
+        UserActivity.objects.bulk_create([
+            UserActivity(user=self.user, activity_type='LOGIN', timestamp=january,
+                         user_agent_id=self.ua_id, ip_address='10.0.0.1', metadata={'n': 1}),
+            UserActivity(user=self.user, activity_type='LOGOUT', timestamp=january),
+            UserActivity(user=self.user, activity_type='LOGIN', timestamp=february),
+            UserActivity(user=self.user, activity_type='LOGIN', timestamp=timezone.now()),
+        ])
+
+        # Small batches: the January rows span two of them
+        moved = archive_rows('activity', timezone.now() - timedelta(days=1),
+                             directory=self.directory, batch_size=1)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(UserActivity.objects.count(), 1)
+        self.assertEqual(archived_months('activity', self.directory), ['2026-01', '2026-02'])
+
+        rows = list(read_archive('activity', '2026-01', self.directory))
+        self.assertEqual([row['activity_type'] for row in rows], ['LOGIN', 'LOGOUT'])
+        self.assertEqual(rows[0]['user__username'], 'archived')
+        self.assertEqual(rows[0]['user_agent__value'], 'Mozilla/5.0')
+        self.assertEqual(rows[0]['metadata'], {'n': 1})
+        self.assertEqual(datetime.fromisoformat(rows[0]['timestamp']), january)
+
+        self.assertEqual(len(list(read_archive('activity', '2026-01', self.directory, activity_type='LOGOUT'))), 1)
+        self.assertEqual(list(read_archive('activity', '2026-01', self.directory, username='someone')), [])
+        self.assertEqual(list(read_archive('activity', '2025-12', self.directory)), [])
+
+    def test_sessions(self):
+        session = LoginSession.objects.create(user=self.user, session_key='abc')
+        LoginSession.objects.filter(pk=session.pk).update(
+            login_time=timezone.make_aware(datetime(2026, 3, 1)),
+        )
+
+        self.assertEqual(archive_rows('sessions', timezone.now(), directory=self.directory), 1)
+        self.assertFalse(LoginSession.objects.exists())
+        [row] = read_archive('sessions', '2026-03', self.directory)
+        self.assertEqual((row['session_key'], row['is_active']), ('abc', True))
+
+
+class LoginSessionLifecycleTests(TestCase):
+    """LoginSessions are closed at logout and by the stale-session sweeper"""
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('sweeper', 'sweeper@example.com', 'pw')
+
+    def login_session(self, key, expires_in=None, login_age=0):
+        if expires_in is not None:
+            Session.objects.create(session_key=key, session_data='', expire_date=timezone.now() + expires_in)
+        session = LoginSession.objects.create(user=self.user, session_key=key)
+        if login_age:
+            LoginSession.objects.filter(pk=session.pk).update(login_time=timezone.now() - login_age)
+        return session
+
+    def test_sweep_closes_expired_and_missing_sessions(self):
+        live = self.login_session('live', expires_in=timedelta(hours=1))
+        expired = self.login_session('expired', expires_in=timedelta(hours=-1))
+        missing = self.login_session('missing')
+        keyless = self.login_session('')
+
+        # Batches of two: the sessions span two batches
+        self.assertEqual(close_stale_sessions(batch_size=2), 3)
+
+        open_sessions = LoginSession.objects.filter(is_active=True)
+        self.assertEqual(list(open_sessions), [live])
+        for session in (expired, missing, keyless):
+            session.refresh_from_db()
+            self.assertIsNotNone(session.logout_time)
+        self.assertEqual(close_stale_sessions(), 0)
+
+    def test_sweep_without_session_table(self):
+        recent = self.login_session('recent', login_age=timedelta(hours=1))
+        old = self.login_session('old', login_age=timedelta(seconds=settings.SESSION_COOKIE_AGE + 60))
+
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+            self.assertEqual(close_stale_sessions(), 1)
+        self.assertEqual(list(LoginSession.objects.filter(is_active=True)), [recent])
+        old.refresh_from_db()
+        self.assertFalse(old.is_active)
+
+    def test_logout_closes_login_session(self):
+        other_device = self.login_session('other-device', expires_in=timedelta(hours=1))
+        self.client.post('/login/', {'username': 'sweeper', 'password': 'pw'})
+        key = self.client.session.session_key
+        self.assertTrue(LoginSession.objects.filter(session_key=key, is_active=True).exists())
+
+        self.client.post('/logout/')
+
+        session = LoginSession.objects.get(session_key=key)
+        self.assertFalse(session.is_active)
+        self.assertIsNotNone(session.logout_time)
+        other_device.refresh_from_db()
+        self.assertTrue(other_device.is_active)
+
+
+@mock.patch.dict(settings.DATABASES, {'replica': {}})
+class ReplicaRoutingTests(SimpleTestCase):
+    """ReplicaRouter and ReplicaStickinessMiddleware (no queries: only routing decisions)"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_and_writes(self):
+        self.assertEqual(self.router.db_for_read(Article), 'replica')
+        self.assertEqual(self.router.db_for_read(UserActivity), 'replica')
+        self.assertIsNone(self.router.db_for_read(User))  # not a replica model
+        self.assertEqual(self.router.db_for_write(Article), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'trendline'))
+        self.assertFalse(self.router.allow_migrate('replica', 'trendline'))
+
+    def test_no_replica_configured(self):
+        with mock.patch.dict(settings.DATABASES):
+            del settings.DATABASES['replica']
+            self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_reads_inside_transaction_use_primary(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Article), 'default')
+
+    def test_pin_to_primary(self):
+        request = RequestFactory().post('/')
+
+        def pinned_read():
+            pin_to_primary(request)
+            return self.router.db_for_read(Article)
+
+        self.assertEqual(contextvars.copy_context().run(pinned_read), 'default')
+        self.assertTrue(request.db_pinned)
+
+    def middleware_read(self, cookie=None, pin=False):
+        """Run a request through the middleware; returns (database read from, response)"""
+        seen = []
+
+        def view(request):
+            if pin:
+                pin_to_primary(request)
+            seen.append(self.router.db_for_read(Article))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        if cookie is not None:
+            request.COOKIES[PIN_COOKIE] = cookie
+        response = contextvars.copy_context().run(ReplicaStickinessMiddleware(view), request)
+        return seen[0], response
+
+    def test_write_sets_cookie(self):
+        with self.settings(DB_REPLICA_STICKY_SECONDS=45):
+            database, response = self.middleware_read(pin=True)
+        self.assertEqual(database, 'default')
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 45)
+        self.assertAlmostEqual(float(cookie.value), time.time() + 45, delta=5)
+        self.assertTrue(cookie['httponly'])
+
+    def test_cookie_pins_following_reads(self):
+        database, response = self.middleware_read(cookie=str(time.time() + 30))
+        self.assertEqual(database, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_expired_or_bad_cookie_reads_replica(self):
+        self.assertEqual(self.middleware_read(cookie=str(time.time() - 1))[0], 'replica')
+        self.assertEqual(self.middleware_read(cookie='garbage')[0], 'replica')
+        self.assertEqual(self.middleware_read()[0], 'replica')
+
+
+class NoOpProfileUpdateTests(TestCase):
+    """Posting a profile's current values writes nothing"""
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_recorder, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('noop', 'noop@example.com', 'pw', first_name='No', last_name='Op')
+        profile = self.user.userprofile
+        profile.bio = 'Same'
+        profile.location = 'Pune'
+        profile.birth_date = datetime(1990, 5, 17).date()
+        profile.email_notifications = True
+        profile.save()
+        self.client.force_login(self.user)
+
+    def test_no_writes(self):
+        unchanged = {
+            'first_name': 'No', 'last_name': ' Op ', 'email': 'noop@example.com',
+            'bio': 'Same', 'location': 'Pune', 'birth_date': '1990-05-17', 'email_notifications': 1,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/profile/update/', json.dumps(unchanged),
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertFalse(UserActivity.objects.filter(activity_type='PROFILE_UPDATE').exists())
+        self.assertNotIn(PIN_COOKIE, response.cookies)  # nothing written, so reads needn't be pinned
+
+
+def image_upload(size=(300, 300), image_format='JPEG', exif=None, name='avatar.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format, **({'exif': exif} if exif else {}))
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class AvatarUploadTests(TestCase):
+    """Avatar uploads are validated, re-encoded without metadata and thumbnailed"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media = Path(media.name)
+
+        for patcher in (mock.patch.object(activity_recorder, 'enabled', False),
+                        # Thumbnails are made inline when the upload commits
+                        mock.patch.object(avatar_processor, 'enabled', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('avatar', 'avatar@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def upload(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/profile/avatar/', {'avatar': upload})
+
+    def stored_files(self):
+        return sorted(str(path.relative_to(self.media)) for path in self.media.rglob('*') if path.is_file())
+
+    def test_oversized_upload_rejected(self):
+        upload = SimpleUploadedFile('big.jpg', b'\0' * (5 * 1024 * 1024 + 1), content_type='image/jpeg')
+        response = self.upload(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_too_many_pixels_rejected(self):
+        with mock.patch('trendline.avatars.AVATAR_MAX_PIXELS', 100 * 100):
+            response = self.upload(image_upload(size=(101, 100)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_not_an_image_rejected(self):
+        response = self.upload(SimpleUploadedFile('fake.png', b'not an image', content_type='image/png'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_exif_applied_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'SpyCam'  # Make
+        self.assertEqual(self.upload(image_upload(size=(40, 20), exif=exif)).status_code, 200)
+
+        profile = UserProfile.objects.get(user=self.user)
+        with profile.avatar.open('rb') as stored, Image.open(stored) as image:
+            self.assertEqual(image.size, (20, 40))  # turned upright
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertNotIn('exif', image.info)
+
+    def test_thumbnails_generated(self):
+        self.assertEqual(self.upload(image_upload()).status_code, 200)
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.avatar_sizes, [64, 128, 256])
+        for size in (64, 128, 256):
+            variant = UserProfile.avatar_variant_name(profile.avatar.name, size)
+            with profile.avatar.storage.open(variant, 'rb') as thumbnail, Image.open(thumbnail) as image:
+                self.assertEqual(image.size, (size, size))
+        self.assertTrue(profile.get_avatar_url(size=100).endswith(f"_128{posixpath.splitext(profile.avatar.name)[1]}"))
+
+    def test_small_avatar_not_upscaled(self):
+        self.upload(image_upload(size=(100, 100)))
+        self.assertEqual(UserProfile.objects.get(user=self.user).avatar_sizes, [64])
+
+    def test_replacing_deletes_old_files(self):
+        self.upload(image_upload())
+        first = self.stored_files()
+        self.upload(image_upload(size=(200, 200)))
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(len(self.stored_files()), 3)  # the new avatar, its 64 and 128 px thumbnails
+        self.assertTrue(set(first).isdisjoint(self.stored_files()))
+        self.assertIn(profile.avatar.name, self.stored_files())
@@ -4,6 +4,13 @@ from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 
+# Under ASGI the news endpoints can use the async views, which wait on
+# NewsAPI without holding a worker thread per request
+if settings.NEWS_ASYNC_VIEWS:
+    from . import async_views as news_views
+else:
+    news_views = views
+
 urlpatterns = [
     # Home page
     path('', views.home_view, name='home'),
@@ -15,19 +22,21 @@ urlpatterns = [
     
     # Dashboard (protected)
     path('dashboard/', views.dashboard_view, name='dashboard'),
-    path("get-news/<str:category>/", views.get_news, name="get_news"),
-    path('api/trending/', views.get_trending_news, name='get_trending'),
+    path("get-news/<str:category>/", news_views.get_news, name="get_news"),
+    path('api/trending/', news_views.get_trending_news, name='get_trending'),
     path('api/trending/advanced/', views.get_advanced_trending_news, name='get_advanced_trending_news'),
-    path('api/recent/', views.get_recent_news, name='get_recent'),
-    path('api/sidebar/', views.get_sidebar_data, name='get_sidebar_data'),
+    path('api/recent/', news_views.get_recent_news, name='get_recent'),
+    path('api/sidebar/', news_views.get_sidebar_data, name='get_sidebar_data'),
     path('profile/', views.profile_view, name='profile'),
     path('api/profile/', views.get_profile_api, name='get_profile_api'),
     path('api/profile/update/', views.update_profile_api, name='update_profile_api'),
     path('api/profile/avatar/', views.upload_avatar_api, name='upload_avatar_api'),
     # path('chat-with-bot/', views.chat_with_bot, name='chat_with_bot'),
     path('get-news/', views.get_news_by_topic, name='get_news_by_topic'),
-    path('api/chat/', views.NewsChatView.as_view(), name='news_chat'),
+    path('api/chat/', news_views.NewsChatView.as_view(), name='news_chat'),
     path('api/test/', views.test_api_view, name='test_api'),
+    path('api/health/', views.health_api, name='health'),
+    path('api/news/metrics/', views.news_metrics_api, name='news_metrics'),
     
 ]
 
@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 from django.utils import timezone
@@ -10,15 +12,19 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
 from datetime import datetime, timedelta
-from django.views.decorators.http import require_http_methods
-from .models import UserProfile, LoginSession, UserActivity
+from django.views.decorators.http import etag, require_http_methods
+from django.utils.cache import patch_cache_control
+from django.db import transaction
+from .models import UserProfile, LoginSession, UserAgent
 import re
 from django.views import View
 from django.utils.decorators import method_decorator
-
-# NewsAPI configuration
-NEWS_API_KEY = "81509bdd2f3d4205bff00a258afce41b"
-NEWS_BASE_URL = "https://newsapi.org/v2/everything"
+from .news_client import news_client
+from .activity import activity_recorder
+from .avatars import InvalidAvatar, avatar_processor, normalize_avatar
+from .routers import pin_to_primary
+from .profiles import cached_profile, store_profile
+from .feeds import feed_request, search_payload, stored_payload
 
 def extract_news_topic(message):
     """Extract news topic from user message"""
@@ -77,19 +83,14 @@ def fetch_news_from_api(query, days_back=10):
             'sortBy': 'publishedAt',
             'language': 'en',
             'pageSize': 10,
-            'apiKey': NEWS_API_KEY
         }
         
-        response = requests.get(NEWS_BASE_URL, params=params, timeout=10)
+        data = news_client.fetch('everything', params)
         
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'ok' and data.get('articles'):
-                return data['articles']
-            else:
-                return None
+        if data.get('status') == 'ok':
+            return data.get('articles') or None
         else:
-            print(f"API Error: {response.status_code}")
+            logger.warning(f"API Error: {data.get('code', 'unknown')}")
             return None
             
     except requests.RequestException as e:
@@ -287,12 +288,12 @@ def register_view(request):
                         user=authenticated_user,
                         login_time=timezone.now(),
                         ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                        user_agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
                         session_key=request.session.session_key or 'unknown'
                     )
                     
                     # Log registration activity
-                    UserActivity.objects.create(
+                    activity_recorder.record(
                         user=authenticated_user,
                         activity_type='REGISTER',
                         description='User registered and auto-logged in',
@@ -330,42 +331,40 @@ def login_view(request):
         form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
             username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
 
-            user = authenticate(request, username=username, password=password)
+            # The form already authenticated these credentials
+            user = form.get_user()
 
             if user is not None:
                 try:
-                    # Login the user
-                    login(request, user)
-                    
-                    # Update and save login details
-                    user.last_login = timezone.now()
-                    user.save(update_fields=['last_login'])
-                    
-                    # Create login session record
-                    LoginSession.objects.create(
-                        user=user,
-                        login_time=timezone.now(),
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        session_key=request.session.session_key or 'unknown'
-                    )
-                    
-                    # Ensure user has a profile
-                    profile, profile_created = UserProfile.objects.get_or_create(
-                        user=user,
-                        defaults={
-                            'bio': '',
-                            'location': '',
-                            'timezone': 'UTC',
-                            'language': 'en',
-                            'email_notifications': True,
-                        }
-                    )
+                    # All login writes commit together (one fsync on SQLite)
+                    with transaction.atomic():
+                        # Login the user (also stores last_login)
+                        login(request, user)
+                        
+                        # Create login session record
+                        LoginSession.objects.create(
+                            user=user,
+                            login_time=timezone.now(),
+                            ip_address=get_client_ip(request),
+                            user_agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
+                            session_key=request.session.session_key or 'unknown'
+                        )
+                        
+                        # Ensure user has a profile; the auth backend loaded the relation with the user
+                        profile_created = not hasattr(user, 'userprofile')
+                        if profile_created:
+                            UserProfile.objects.create(
+                                user=user,
+                                bio='',
+                                location='',
+                                timezone='UTC',
+                                language='en',
+                                email_notifications=True,
+                            )
                     
                     # Log login activity
-                    UserActivity.objects.create(
+                    activity_recorder.record(
                         user=user,
                         activity_type='LOGIN',
                         description='User logged in successfully',
@@ -418,7 +417,7 @@ def dashboard_view(request):
         logger.info(f'User {request.user.username} accessed dashboard')
         
         # Log dashboard activity
-        UserActivity.objects.create(
+        activity_recorder.record(
             user=request.user,
             activity_type='DASHBOARD_VIEW',
             description='User accessed dashboard',
@@ -445,23 +444,10 @@ def logout_view(request):
         try:
             username = request.user.username if request.user.is_authenticated else 'Anonymous'
             
-            # Update login session
+            # The LoginSession is closed by the user_logged_out signal in logout()
             if request.user.is_authenticated:
-                try:
-                    session = LoginSession.objects.filter(
-                        user=request.user,
-                        session_key=request.session.session_key,
-                        is_active=True
-                    ).first()
-                    if session:
-                        session.logout_time = timezone.now()
-                        session.is_active = False
-                        session.save()
-                except Exception as e:
-                    logger.warning(f'Error updating login session for {username}: {str(e)}')
-                
                 # Log logout activity
-                UserActivity.objects.create(
+                activity_recorder.record(
                     user=request.user,
                     activity_type='LOGOUT',
                     description='User logged out',
@@ -515,6 +501,11 @@ def get_client_ip(request):
     return ip
 
 
+def _email_taken(user, email):
+    """True if another account already uses this address (in any case)"""
+    return bool(email) and User.objects.filter(email__lower=email.lower()).exclude(pk=user.pk).exists()
+
+
 # Additional view for updating user profile
 @login_required
 def update_profile_view(request):
@@ -529,17 +520,22 @@ def update_profile_view(request):
             user.last_name = request.POST.get('last_name', user.last_name)
             user.email = request.POST.get('email', user.email)
             
+            # Checked here so a duplicate doesn't fail on the unique LOWER(email) index
+            if _email_taken(user, user.email):
+                messages.error(request, 'This email is already registered.')
+                return redirect('dashboard')
+            
             # Update profile fields
             profile.phone_number = request.POST.get('phone_number', profile.phone_number)
             profile.bio = request.POST.get('bio', profile.bio)
             profile.location = request.POST.get('location', profile.location)
             
             # Save all changes to database
-            user.save()
-            profile.save()
+            user.save(update_fields=['first_name', 'last_name', 'email'])
+            profile.save(update_fields=['phone_number', 'bio', 'location', 'updated_at'])
             
             # Log profile update activity
-            UserActivity.objects.create(
+            activity_recorder.record(
                 user=user,
                 activity_type='PROFILE_UPDATE',
                 description='Profile updated via form',
@@ -567,34 +563,25 @@ def update_profile_view(request):
 
 
 def get_news(request, category):
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-
-    category_mapping = {
-        # "all": "India",
-        "politics": "India politics government",
-        "bollywood": "India bollywood entertainment movies",
-        "sports": "India sports cricket football",
-        "technology": "India technology gadgets innovation",
-        "business": "India business economy finance",
-        "health": "India health medicine covid",
-        "international": "world news global international relations",
-        "science": "science research space ISRO NASA discovery",
-        "environment": "India environment climate change pollution",
-        "education": "India education schools universities students",
-        "lifestyle": "India lifestyle fashion food travel culture"
-    }
-
-    query = category_mapping.get(category, "India")
-    search_query = request.GET.get("q", "")
-
-    # Use top-headlines for all, everything for specific categories
-    if category == "all":
-        url = f"https://newsapi.org/v2/top-headlines?country=in&apiKey={api_key}"
-    else:
-        url = f"https://newsapi.org/v2/everything?q={query}&sortBy=publishedAt&language=en&apiKey={api_key}"
+    search_query = request.GET.get("q", "").strip()
 
-    response = requests.get(url)
-    data = response.json()
+    # Answer searches from the local full-text index across all ingested articles
+    if search_query:
+        data = search_payload(search_query, tag=None if category == "all" else category)
+        if data is not None:
+            return JsonResponse(data)
+
+    # Serve from the local article store when the ingest worker keeps it fresh,
+    # otherwise use top-headlines for all, everything for specific categories
+    data = stored_payload(category)
+    if data is None:
+        endpoint, params = feed_request(category)
+        try:
+            data = news_client.fetch(endpoint, params)
+        except requests.RequestException as e:
+            # Breaker open, budget spent or network down, with nothing cached
+            logger.warning(f"News for '{category}' unavailable: {e}")
+            return JsonResponse({"status": "error", "message": str(e), "totalResults": 0, "articles": []})
     articles = data.get("articles", [])
 
     if search_query:
@@ -602,51 +589,51 @@ def get_news(request, category):
 
     return JsonResponse({"status": "ok", "totalResults": len(articles), "articles": articles})
 
+def _trending_items(data):
+    """Filter and format a trending payload for the frontend"""
+    articles = data.get("articles", [])
+    
+    # Filter out low-quality articles
+    filtered_articles = []
+    for article in articles:
+        title = article.get("title", "")
+        description = article.get("description", "")
+        
+        # Skip articles with these patterns
+        if any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]', 'untitled']):
+            continue
+        if not title or not description:
+            continue
+            
+        filtered_articles.append(article)
+    
+    # Format for frontend
+    trending_items = []
+    for article in filtered_articles[:6]:
+        trending_items.append({
+            "title": article.get("title", ""),
+            "description": article.get("description", "")[:100] + "..." if article.get("description") else "",
+            "url": article.get("url", ""),
+            "publishedAt": article.get("publishedAt", ""),
+            "source": article.get("source", {}).get("name", ""),
+            "urlToImage": article.get("urlToImage", "")
+        })
+    return trending_items
+
+
 def get_trending_news(request):
     """Get trending news using popularity and recent timeframe"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     try:
-        # Calculate date for last 3 days for trending topics
-        from_date = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
-        
-        # Use everything endpoint with trending keywords and popularity sorting
-        trending_keywords = "India trending OR viral OR popular OR breaking OR major"
-        url = f"https://newsapi.org/v2/everything?q={trending_keywords}&language=en&from={from_date}&sortBy=popularity&pageSize=15&apiKey={api_key}"
-        
-        response = requests.get(url)
-        data = response.json()
-        articles = data.get("articles", [])
+        # Popular articles from the last 3 days matching trending keywords
+        data = stored_payload('trending-wide')
         
-        # Filter out low-quality articles
-        filtered_articles = []
-        for article in articles:
-            title = article.get("title", "")
-            description = article.get("description", "")
-            
-            # Skip articles with these patterns
-            if any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]', 'untitled']):
-                continue
-            if not title or not description:
-                continue
-                
-            filtered_articles.append(article)
-        
-        # Format for frontend
-        trending_items = []
-        for article in filtered_articles[:6]:
-            trending_items.append({
-                "title": article.get("title", ""),
-                "description": article.get("description", "")[:100] + "..." if article.get("description") else "",
-                "url": article.get("url", ""),
-                "publishedAt": article.get("publishedAt", ""),
-                "source": article.get("source", {}).get("name", ""),
-                "urlToImage": article.get("urlToImage", "")
-            })
+        if data is None:
+            endpoint, params = feed_request('trending-wide')
+            data = news_client.fetch(endpoint, params)
         
         return JsonResponse({
             "status": "ok",
-            "trending": trending_items
+            "trending": _trending_items(data)
         })
     
     except requests.RequestException as e:
@@ -655,14 +642,9 @@ def get_trending_news(request):
 
 def get_recent_news(request):
     """Get recent news for sidebar"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
-    # Get top headlines from India
-    url = f"https://newsapi.org/v2/top-headlines?country=in&pageSize=8&apiKey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        # Get top headlines from India
+        data = news_client.top_headlines(country="in", pageSize=8)
         articles = data.get("articles", [])
         
         recent_items = []
@@ -685,131 +667,110 @@ def get_recent_news(request):
         return JsonResponse({"status": "error", "message": str(e)})
 
 
+def _sidebar_items(data, description_length):
+    """Format up to 6 sidebar entries from a NewsAPI payload"""
+    items = []
+    if not data or data.get('status') != 'ok':
+        return items
+    
+    for article in data.get("articles", [])[:6]:
+        title = article.get("title", "")
+        if title and not any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]']):
+            items.append({
+                "title": title,
+                "description": article.get("description", "")[:description_length] + "..." if article.get("description") else "No description available.",
+                "url": article.get("url", ""),
+                "publishedAt": article.get("publishedAt", ""),
+                "source": article.get("source", {}).get("name", "Unknown")
+            })
+    return items
+
+
+# Headlines without the country filter, for when recent news comes back empty
+SIDEBAR_FALLBACK = {'fallback': ('top-headlines', {'language': "en", 'pageSize': 10})}
+
+
+def _sidebar_calls(stored):
+    """Upstream calls still needed for the sidebar after consulting the local store"""
+    calls = {
+        'trending': feed_request('trending'),
+        'recent': feed_request('recent'),
+    }
+    return {name: call for name, call in calls.items() if not stored.get(name)}
+
+
+def _needs_fallback(results):
+    """True when recent news failed or had nothing usable"""
+    return not _sidebar_items(results.get('recent'), 80)
+
+
+def _sidebar_response(results):
+    # ===== TRENDING NEWS =====
+    trending_items = _sidebar_items(results.get('trending'), 100)
+    
+    # ===== RECENT NEWS =====
+    recent_items = _sidebar_items(results.get('recent'), 80)
+    
+    # ===== FALLBACK: If recent news is empty, use headlines without country filter =====
+    if not recent_items:
+        recent_items = _sidebar_items(results.get('fallback'), 80)
+    
+    return JsonResponse({
+        "status": "ok",
+        "sidebar": {
+            "trending": trending_items,
+            "recent": recent_items
+        }
+    })
+
+
+def _sidebar_error(e):
+    print(f"Critical error in get_sidebar_data: {str(e)}")
+    return JsonResponse({
+        "status": "error", 
+        "message": str(e),
+        "sidebar": {
+            "trending": [],
+            "recent": []
+        }
+    })
+
+
 def get_sidebar_data(request):
     """Combined endpoint for both trending and recent news with detailed logging"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     try:
-        trending_items = []
-        recent_items = []
-        
-        # ===== GET TRENDING NEWS =====
-        try:
-            from_date = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
-            trending_url = f"https://newsapi.org/v2/everything?q=India trending OR viral OR popular&language=en&from={from_date}&sortBy=popularity&pageSize=10&apiKey={api_key}"
-            
-            trending_response = requests.get(trending_url, timeout=10)
-            trending_data = trending_response.json()
-            
-            if trending_data.get('status') == 'ok':
-                trending_articles = trending_data.get("articles", [])
-                
-                for article in trending_articles[:6]:
-                    title = article.get("title", "")
-                    if title and not any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]']):
-                        trending_items.append({
-                            "title": title,
-                            "description": article.get("description", "")[:100] + "..." if article.get("description") else "No description available.",
-                            "url": article.get("url", ""),
-                            "publishedAt": article.get("publishedAt", ""),
-                            "source": article.get("source", {}).get("name", "Unknown")
-                        })
-                        
-        except Exception as e:
-            print(f"Error fetching trending news: {str(e)}")
-        
-        # ===== GET RECENT NEWS =====
-        try:
-            recent_url = f"https://newsapi.org/v2/top-headlines?country=in&pageSize=10&apiKey={api_key}"
-            
-            recent_response = requests.get(recent_url, timeout=10)
-            recent_data = recent_response.json()
-            
-            if recent_data.get('status') == 'ok':
-                recent_articles = recent_data.get("articles", [])
-                
-                for article in recent_articles[:6]:
-                    title = article.get("title", "")
-                    if title and not any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]']):
-                        recent_items.append({
-                            "title": title,
-                            "description": article.get("description", "")[:80] + "..." if article.get("description") else "No description available.",
-                            "url": article.get("url", ""),
-                            "publishedAt": article.get("publishedAt", ""),
-                            "source": article.get("source", {}).get("name", "Unknown")
-                        })
-                        
-        except Exception as e:
-            print(f"Error fetching recent news: {str(e)}")
+        # Use the local article store for any feed the ingest worker keeps fresh
+        results = {
+            'trending': stored_payload('trending'),
+            'recent': stored_payload('recent'),
+        }
         
-        # ===== FALLBACK: If recent news is empty, try without country filter =====
-        if not recent_items:
-            try:
-                fallback_url = f"https://newsapi.org/v2/top-headlines?language=en&pageSize=10&apiKey={api_key}"
-                
-                fallback_response = requests.get(fallback_url, timeout=10)
-                fallback_data = fallback_response.json()
-                
-                if fallback_data.get('status') == 'ok':
-                    fallback_articles = fallback_data.get("articles", [])
-                    
-                    for article in fallback_articles[:6]:
-                        title = article.get("title", "")
-                        if title and not any(skip in title.lower() for skip in ['removed', 'deleted', '[removed]']):
-                            recent_items.append({
-                                "title": title,
-                                "description": article.get("description", "")[:80] + "..." if article.get("description") else "No description available.",
-                                "url": article.get("url", ""),
-                                "publishedAt": article.get("publishedAt", ""),
-                                "source": article.get("source", {}).get("name", "Unknown")
-                            })
-                            
-            except Exception as e:
-                print(f"Fallback also failed: {str(e)}")
+        # Fetch whatever is left concurrently so the endpoint waits for the
+        # slowest call instead of the sum of both
+        results.update(news_client.fetch_many(_sidebar_calls(results)))
+        if _needs_fallback(results):
+            results.update(news_client.fetch_many(SIDEBAR_FALLBACK))
         
-        # ===== RETURN RESPONSE =====
-        return JsonResponse({
-            "status": "ok",
-            "sidebar": {
-                "trending": trending_items,
-                "recent": recent_items
-            }
-        })
+        return _sidebar_response(results)
         
     except Exception as e:
-        print(f"Critical error in get_sidebar_data: {str(e)}")
-        return JsonResponse({
-            "status": "error", 
-            "message": str(e),
-            "sidebar": {
-                "trending": [],
-                "recent": []
-            }
-        })
+        return _sidebar_error(e)
 
 
 def get_advanced_trending_news(request):
     """Advanced trending news with multiple strategies"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     try:
-        all_trending = []
-        
         # Strategy 1: Popular articles from last 2 days
-        from_date = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
-        popular_url = f"https://newsapi.org/v2/everything?language=en&from={from_date}&sortBy=popularity&pageSize=8&apiKey={api_key}"
-        
-        popular_response = requests.get(popular_url)
-        popular_data = popular_response.json()
-        popular_articles = popular_data.get("articles", [])[:4]
-        
         # Strategy 2: Trending keywords
-        trending_keywords = "trending OR viral OR breaking OR major OR important"
-        keyword_url = f"https://newsapi.org/v2/everything?q={trending_keywords}&language=en&from={from_date}&sortBy=popularity&pageSize=6&apiKey={api_key}"
+        feeds = {'popular': 'advanced-popular', 'keyword': 'advanced-keyword'}
+        results = {strategy: stored_payload(feed) for strategy, feed in feeds.items()}
         
-        keyword_response = requests.get(keyword_url)
-        keyword_data = keyword_response.json()
-        keyword_articles = keyword_data.get("articles", [])[:3]
+        # Run whichever strategies the store can't answer concurrently
+        results.update(news_client.fetch_many({
+            strategy: feed_request(feed) for strategy, feed in feeds.items() if not results[strategy]
+        }))
+        popular_articles = (results['popular'] or {}).get("articles", [])[:4]
+        keyword_articles = (results['keyword'] or {}).get("articles", [])[:3]
         
         # Combine and remove duplicates
         all_articles = popular_articles + keyword_articles
@@ -845,47 +806,44 @@ def get_advanced_trending_news(request):
         return JsonResponse({"status": "error", "message": str(e)})
 
 
+def _recent_items(data):
+    """Format a recent news payload for sidebar display"""
+    recent_items = []
+    for article in data.get("articles", [])[:6]:  # Limit to 6 items for sidebar
+        published_date = article.get("publishedAt", "")
+        if published_date:
+            # Parse and format date for better display
+            try:
+                date_obj = datetime.fromisoformat(published_date.replace('Z', '+00:00'))
+                formatted_date = date_obj.strftime('%b %d, %Y')
+            except:
+                formatted_date = published_date[:10]  # Fallback to YYYY-MM-DD
+        else:
+            formatted_date = ""
+        
+        recent_items.append({
+            "title": article.get("title", ""),
+            "description": article.get("description", "")[:100] + "..." if article.get("description") else "",
+            "url": article.get("url", ""),
+            "publishedAt": formatted_date,
+            "source": article.get("source", {}).get("name", "")
+        })
+    return recent_items
+
+
 def get_recent_news(request):
     """Get news from past 10 days for sidebar"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
-    # Calculate date 10 days ago
-    ten_days_ago = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')
-    today = datetime.now().strftime('%Y-%m-%d')
-    
-    # Get recent news from past 10 days
-    url = f"https://newsapi.org/v2/everything?q=India&from={ten_days_ago}&to={today}&sortBy=publishedAt&language=en&pageSize=15&apiKey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
-        articles = data.get("articles", [])
+        # Get recent news from past 10 days
+        data = stored_payload('recent-india')
         
-        # Format for sidebar display
-        recent_items = []
-        for article in articles[:6]:  # Limit to 6 items for sidebar
-            published_date = article.get("publishedAt", "")
-            if published_date:
-                # Parse and format date for better display
-                try:
-                    date_obj = datetime.fromisoformat(published_date.replace('Z', '+00:00'))
-                    formatted_date = date_obj.strftime('%b %d, %Y')
-                except:
-                    formatted_date = published_date[:10]  # Fallback to YYYY-MM-DD
-            else:
-                formatted_date = ""
-            
-            recent_items.append({
-                "title": article.get("title", ""),
-                "description": article.get("description", "")[:100] + "..." if article.get("description") else "",
-                "url": article.get("url", ""),
-                "publishedAt": formatted_date,
-                "source": article.get("source", {}).get("name", "")
-            })
+        if data is None:
+            endpoint, params = feed_request('recent-india')
+            data = news_client.fetch(endpoint, params)
         
         return JsonResponse({
             "status": "ok",
-            "recent": recent_items
+            "recent": _recent_items(data)
         })
         
     except requests.RequestException as e:
@@ -894,8 +852,6 @@ def get_recent_news(request):
 
 def process_news_query(user_message):
     """Process user message and return appropriate news response"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     # Intent detection patterns
     patterns = {
         'trending': ['trending', 'popular', 'hot', 'viral', 'top news'],
@@ -934,12 +890,8 @@ def detect_intent(message, patterns):
 
 def get_trending_response():
     """Get trending news response"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    url = f"https://newsapi.org/v2/top-headlines?country=in&pageSize=5&apiKey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = news_client.top_headlines(country="in", pageSize=5)
         articles = data.get("articles", [])
         
         if articles:
@@ -959,13 +911,12 @@ def get_trending_response():
 
 def get_recent_response():
     """Get recent news response"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
     today = datetime.now().strftime('%Y-%m-%d')
-    url = f"https://newsapi.org/v2/everything?q=India&from={today}&sortBy=publishedAt&language=en&pageSize=5&apiKey={api_key}"
     
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = news_client.everything(
+            q="India", **{"from": today}, sortBy="publishedAt", language="en", pageSize=5
+        )
         articles = data.get("articles", [])
         
         if articles:
@@ -994,8 +945,6 @@ def get_recent_response():
 
 def get_category_response(category):
     """Get category-specific news response"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     category_queries = {
         'sports': 'India sports cricket football',
         'politics': 'India politics government',
@@ -1017,11 +966,8 @@ def get_category_response(category):
     query = category_queries.get(category, f'India {category}')
     emoji = category_emojis.get(category, '📰')
     
-    url = f"https://newsapi.org/v2/everything?q={query}&sortBy=publishedAt&language=en&pageSize=5&apiKey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = news_client.everything(q=query, sortBy="publishedAt", language="en", pageSize=5)
         articles = data.get("articles", [])
         
         if articles:
@@ -1041,14 +987,10 @@ def get_category_response(category):
 
 def search_news_response(query):
     """Search for news based on user query"""
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
     search_query = f"India {query}"
     
-    url = f"https://newsapi.org/v2/everything?q={search_query}&sortBy=relevancy&language=en&pageSize=5&apiKey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = news_client.everything(q=search_query, sortBy="relevancy", language="en", pageSize=5)
         articles = data.get("articles", [])
         
         if articles:
@@ -1107,7 +1049,7 @@ def profile_view(request):
         
         if created:
             # Log activity when profile is created
-            UserActivity.objects.create(
+            activity_recorder.record(
                 user=request.user,
                 activity_type='PROFILE_UPDATE',
                 description='Profile automatically created',
@@ -1130,34 +1072,30 @@ def profile_view(request):
         return redirect('dashboard')
 
 
+def _profile_etag(request):
+    try:
+        return cached_profile(request.user)['etag']
+    except Exception:
+        # Let the view report the error
+        return None
+
+
 @login_required
 @require_http_methods(["GET"])
+@etag(_profile_etag)
 def get_profile_api(request):
-    """API endpoint to get user profile data"""
+    """API endpoint to get user profile data (304 when If-None-Match matches)"""
     try:
-        user = request.user
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        
-        # Prepare profile data
-        profile_data = {
-            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
-            'email': user.email,
-            'phone_number': profile.phone_number or '',
-            'bio': profile.bio or '',
-            'website': profile.website or '',
-            'location': profile.location or '',
-            'birth_date': profile.birth_date.strftime('%Y-%m-%d') if profile.birth_date else '',
-            'gender': profile.gender or '',
-            'avatar_url': profile.get_avatar_url(),
-            'email_notifications': profile.email_notifications,
-            'sms_notifications': profile.sms_notifications,
-            'marketing_emails': profile.marketing_emails,
-        }
+        # Served from the per-user profile cache, refreshed on every profile write
+        entry = cached_profile(request.user)
         
-        return JsonResponse({
+        response = JsonResponse({
             'status': 'success',
-            'profile': profile_data
+            'profile': entry['profile']
         })
+        # Browsers must revalidate, which costs a 304 with no body when unchanged
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
         
     except Exception as e:
         logger.error(f'Error getting profile data for user {request.user.username}: {str(e)}')
@@ -1167,6 +1105,13 @@ def get_profile_api(request):
         }, status=500)
 
 
+def _assign(instance, field, value, changed):
+    """Set a field only if the value differs, noting it in `changed` for update_fields"""
+    if getattr(instance, field) != value:
+        setattr(instance, field, value)
+        changed.append(field)
+
+
 @login_required
 @require_http_methods(["POST"])
 def update_profile_api(request):
@@ -1184,73 +1129,68 @@ def update_profile_api(request):
                 'message': 'Invalid JSON data'
             }, status=400)
         
+        # Only fields whose value actually changes are written
+        user_changed = []
+        profile_changed = []
+        
         # Update user fields
-        if 'first_name' in data:
-            user.first_name = data['first_name'].strip()
-        if 'last_name' in data:
-            user.last_name = data['last_name'].strip()
-        if 'email' in data:
-            user.email = data['email'].strip()
+        for field in ('first_name', 'last_name', 'email'):
+            if field in data:
+                _assign(user, field, data[field].strip(), user_changed)
+        
+        if 'email' in user_changed and _email_taken(user, user.email):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'This email is already registered.'
+            }, status=400)
         
         # Update profile fields
-        profile.phone_number = data.get('phone_number', profile.phone_number)
-        profile.bio = data.get('bio', profile.bio)
-        profile.website = data.get('website', profile.website)
-        profile.location = data.get('location', profile.location)
-        profile.gender = data.get('gender', profile.gender)
+        for field in ('phone_number', 'bio', 'website', 'location', 'gender'):
+            if field in data:
+                _assign(profile, field, data[field], profile_changed)
         
         # Handle birth_date
         if 'birth_date' in data and data['birth_date']:
             try:
                 from datetime import datetime
-                profile.birth_date = datetime.strptime(data['birth_date'], '%Y-%m-%d').date()
+                birth_date = datetime.strptime(data['birth_date'], '%Y-%m-%d').date()
+                _assign(profile, 'birth_date', birth_date, profile_changed)
             except ValueError:
                 pass  # Keep existing birth_date if invalid format
         
         # Update notification preferences
-        if 'email_notifications' in data:
-            profile.email_notifications = bool(data['email_notifications'])
-        if 'sms_notifications' in data:
-            profile.sms_notifications = bool(data['sms_notifications'])
-        if 'marketing_emails' in data:
-            profile.marketing_emails = bool(data['marketing_emails'])
-        
-        # Save changes
-        user.save()
-        profile.save()
-        
-        # Log activity
-        UserActivity.objects.create(
-            user=user,
-            activity_type='PROFILE_UPDATE',
-            description='Profile updated via API',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            metadata={'update_method': 'api'}
-        )
+        for field in ('email_notifications', 'sms_notifications', 'marketing_emails'):
+            if field in data:
+                _assign(profile, field, bool(data[field]), profile_changed)
+        
+        # Save changes (nothing is written when nothing changed)
+        if user_changed or profile_changed:
+            with transaction.atomic():
+                if user_changed:
+                    user.save(update_fields=user_changed)
+                if profile_changed:
+                    profile.save(update_fields=profile_changed + ['updated_at'])
+            pin_to_primary(request)
+            
+            # Log activity
+            activity_recorder.record(
+                user=user,
+                activity_type='PROFILE_UPDATE',
+                description='Profile updated via API',
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                metadata={'update_method': 'api', 'fields': user_changed + profile_changed}
+            )
+            
+            logger.info(f'User {user.username} updated their profile via API')
         
-        logger.info(f'User {user.username} updated their profile via API')
-        
-        # Return updated profile data
-        profile_data = {
-            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
-            'email': user.email,
-            'phone_number': profile.phone_number or '',
-            'bio': profile.bio or '',
-            'website': profile.website or '',
-            'location': profile.location or '',
-            'birth_date': profile.birth_date.strftime('%Y-%m-%d') if profile.birth_date else '',
-            'gender': profile.gender or '',
-            'avatar_url': profile.get_avatar_url(),
-            'email_notifications': profile.email_notifications,
-            'sms_notifications': profile.sms_notifications,
-            'marketing_emails': profile.marketing_emails,
-        }
+        # Return updated profile data (and replace the cached copy)
+        entry = store_profile(user, profile)
         
         return JsonResponse({
             'status': 'success',
             'message': 'Profile updated successfully',
-            'profile': profile_data
+            'profile': entry['profile']
         })
         
     except Exception as e:
@@ -1291,12 +1231,27 @@ def upload_avatar_api(request):
                 'message': 'Please select a valid image file'
             }, status=400)
         
-        # Save the avatar
-        profile.avatar = avatar_file
-        profile.save()
+        # Re-encode (no metadata, capped size) before anything is stored
+        try:
+            normalized = normalize_avatar(avatar_file)
+        except InvalidAvatar:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Please select a valid image file'
+            }, status=400)
+        
+        # Save the avatar; thumbnails are made in the background
+        old_name, old_sizes = profile.avatar.name, profile.avatar_sizes
+        with transaction.atomic():
+            profile.avatar.save(normalized.name, normalized, save=False)
+            profile.avatar_sizes = []
+            profile.save(update_fields=['avatar', 'avatar_sizes', 'updated_at'])
+            avatar_processor.submit(profile, old_name=old_name, old_sizes=old_sizes)
+        pin_to_primary(request)
+        store_profile(user, profile)
         
         # Log activity
-        UserActivity.objects.create(
+        activity_recorder.record(
             user=user,
             activity_type='PROFILE_UPDATE',
             description='Avatar uploaded',
@@ -1358,11 +1313,7 @@ class NewsChatView(View):
     News Chat API View - handles chatbot queries
     """
     
-    def __init__(self):
-        super().__init__()
-        self.api_key = "81509bdd2f3d4205bff00a258afce41b"
-        self.base_url = "https://newsapi.org/v2/everything"
-        self.top_headlines_url = "https://newsapi.org/v2/top-headlines"
+    client = news_client
     
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
@@ -1382,15 +1333,8 @@ class NewsChatView(View):
                     'message': 'No message provided'
                 })
             
-            # Test API key first
-            api_test_result = self.test_api_connection()
-            if not api_test_result['success']:
-                return JsonResponse({
-                    'status': 'success',  # Changed to success to display message
-                    'bot_response': f"🔧 **API Connection Issue**\n\n{api_test_result['error']}\n\nPlease check:\n• API key validity\n• Internet connection\n• News API service status"
-                })
-            
-            # Generate response
+            # Generate response; cached and locally stored news is served even
+            # while NewsAPI is down, so upstream health only matters on failure
             response = self.generate_news_response(user_message)
             
             return JsonResponse({
@@ -1411,137 +1355,122 @@ class NewsChatView(View):
                 'message': f'An error occurred: {str(e)}'
             })
     
-    def test_api_connection(self):
-        """
-        Test the News API connection and return detailed results
-        """
-        try:
-            logger.info(f"Testing API connection to: {self.top_headlines_url}")
-            
-            response = requests.get(
-                self.top_headlines_url,
-                params={
-                    'country': 'us',
-                    'pageSize': 1,
-                    'apiKey': self.api_key
-                },
-                timeout=10
-            )
-            
-            logger.info(f"API Response Status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"API Response Data Status: {data.get('status')}")
-                
-                if data.get('status') == 'ok':
-                    return {'success': True}
-                else:
-                    return {
-                        'success': False,
-                        'error': f"API returned error: {data.get('message', 'Unknown error')}"
-                    }
-            elif response.status_code == 401:
-                return {
-                    'success': False,
-                    'error': "API key is invalid or expired. Please check your News API key."
-                }
-            elif response.status_code == 429:
-                return {
-                    'success': False,
-                    'error': "API rate limit exceeded. Please try again later."
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f"API returned status code {response.status_code}"
-                }
-                
-        except requests.exceptions.Timeout:
-            return {
-                'success': False,
-                'error': "Request timeout. News API is taking too long to respond."
-            }
-        except requests.exceptions.ConnectionError:
-            return {
-                'success': False,
-                'error': "Connection error. Please check your internet connection."
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f"Unexpected error during API test: {str(e)}"
-            }
+    GREETING = ("👋 **Welcome to TrendLine News Chat!**\n\n"
+                "I can help you with:\n"
+                "• 🔥 Trending news\n"
+                "• ⚽ Sports updates\n"
+                "• 🎬 Bollywood gossip\n"
+                "• 💻 Tech news\n"
+                "• 💼 Business updates\n"
+                "• 🏥 Health news\n\n"
+                "Just ask me about any topic!")
     
-    def generate_news_response(self, user_message):
+    def route_message(self, user_message):
         """
-        Generate appropriate news response based on user message
+        Detect query intent: returns ('greeting', ()), ('trending', ()) or
+        ('search', (query, category))
         """
         message_lower = user_message.lower()
         
-        logger.info(f"Processing message: {user_message}")
-        
         # Handle greetings
         if any(word in message_lower for word in ['hello', 'hi', 'hey', 'help', 'start']):
-            return ("👋 **Welcome to TrendLine News Chat!**\n\n"
-                   "I can help you with:\n"
-                   "• 🔥 Trending news\n"
-                   "• ⚽ Sports updates\n"
-                   "• 🎬 Bollywood gossip\n"
-                   "• 💻 Tech news\n"
-                   "• 💼 Business updates\n"
-                   "• 🏥 Health news\n\n"
-                   "Just ask me about any topic!")
-        
-        # Detect query intent
+            return 'greeting', ()
+        
         if any(word in message_lower for word in ['trending', 'popular', 'hot', 'viral', 'today']):
-            return self.get_trending_news()
+            return 'trending', ()
         elif any(word in message_lower for word in ['sports', 'football', 'cricket', 'tennis', 'soccer']):
-            return self.search_news('sports', category='sports')
+            return 'search', ('sports', 'sports')
         elif any(word in message_lower for word in ['bollywood', 'movies', 'entertainment', 'celebrity']):
-            return self.search_news('bollywood entertainment', category='entertainment')
+            return 'search', ('bollywood entertainment', 'entertainment')
         elif any(word in message_lower for word in ['technology', 'tech', 'gadgets', 'ai', 'software']):
-            return self.search_news('technology', category='technology')
+            return 'search', ('technology', 'technology')
         elif any(word in message_lower for word in ['business', 'finance', 'economy', 'market', 'stock']):
-            return self.search_news('business', category='business')
+            return 'search', ('business', 'business')
         elif any(word in message_lower for word in ['health', 'medical', 'coronavirus', 'covid']):
-            return self.search_news('health', category='health')
+            return 'search', ('health', 'health')
         elif any(word in message_lower for word in ['politics', 'election', 'government']):
-            return self.search_news('politics')
+            return 'search', ('politics', None)
+        else:
+            return 'search', (user_message, None)
+    
+    def generate_news_response(self, user_message):
+        """
+        Generate appropriate news response based on user message
+        """
+        logger.info(f"Processing message: {user_message}")
+        
+        action, args = self.route_message(user_message)
+        if action == 'greeting':
+            return self.GREETING
+        if action == 'trending':
+            return self.get_trending_news()
+        return self.search_news(*args)
+    
+    def upstream_error(self, fallback):
+        """Reply for a query nothing cached or stored could answer, explaining an unhealthy upstream"""
+        health = self.client.health()
+        if health['healthy']:
+            return fallback
+        return f"🔧 **API Connection Issue**\n\n{health['error']}\n\nPlease check:\n• API key validity\n• Internet connection\n• News API service status"
+    
+    def trending_params(self):
+        return {
+            'country': 'us',
+            'pageSize': 5,
+        }
+    
+    def category_params(self, category):
+        return {
+            'category': category,
+            'country': 'us',
+            'pageSize': 5,
+        }
+    
+    def search_params(self, query):
+        # Add date filter for recent news (last 30 days)
+        month_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        return {
+            'q': query,
+            'sortBy': 'publishedAt',
+            'pageSize': 5,
+            'language': 'en',
+            'from': month_ago,
+        }
+    
+    def trending_response(self, data):
+        """Turn a top-headlines payload into the trending chat reply"""
+        logger.info(f"Response status: {data.get('status')}, articles: {len(data.get('articles', []))}")
+        
+        if data['status'] == 'ok' and data['articles']:
+            return self.format_news_response(data['articles'], "🔥 **Trending News**")
+        elif data['status'] == 'ok' and not data['articles']:
+            return "📰 No trending articles found at the moment. Try searching for specific topics instead!"
         else:
-            return self.search_news(user_message)
+            error_msg = data.get('message', 'Unknown API error')
+            logger.error(f"API error: {error_msg}")
+            return f"❌ **API Error**: {error_msg}"
+    
+    def search_response(self, data, query):
+        """Turn an everything payload into the search chat reply"""
+        if data['status'] == 'ok' and data['articles']:
+            return self.format_news_response(data['articles'], f"🔍 **Search Results for: {query}**")
+        else:
+            return f"🔍 **No Results Found**\n\nNo recent news found for '{query}'. Try different keywords!"
     
     def get_trending_news(self):
         """
         Fetch trending/top headlines
         """
         try:
-            params = {
-                'country': 'us',
-                'pageSize': 5,
-                'apiKey': self.api_key
-            }
+            params = self.trending_params()
             
             logger.info(f"Fetching trending news with params: {params}")
             
-            response = requests.get(self.top_headlines_url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            logger.info(f"Response status: {data.get('status')}, articles: {len(data.get('articles', []))}")
-            
-            if data['status'] == 'ok' and data['articles']:
-                return self.format_news_response(data['articles'], "🔥 **Trending News**")
-            elif data['status'] == 'ok' and not data['articles']:
-                return "📰 No trending articles found at the moment. Try searching for specific topics instead!"
-            else:
-                error_msg = data.get('message', 'Unknown API error')
-                logger.error(f"API error: {error_msg}")
-                return f"❌ **API Error**: {error_msg}"
+            return self.trending_response(self.client.fetch('top-headlines', params))
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error: {e}")
-            return f"🔌 **Connection Error**: Could not fetch news. Please try again."
+            return self.upstream_error("🔌 **Connection Error**: Could not fetch news. Please try again.")
         except Exception as e:
             logger.error(f"Unexpected error in get_trending_news: {e}")
             return f"⚠️ **Unexpected Error**: {str(e)}"
@@ -1556,16 +1485,7 @@ class NewsChatView(View):
             # Try top headlines first if category is specified
             if category:
                 try:
-                    headlines_params = {
-                        'category': category,
-                        'country': 'us',
-                        'pageSize': 5,
-                        'apiKey': self.api_key
-                    }
-                    
-                    response = requests.get(self.top_headlines_url, params=headlines_params, timeout=15)
-                    response.raise_for_status()
-                    data = response.json()
+                    data = self.client.fetch('top-headlines', self.category_params(category))
                     
                     if data['status'] == 'ok' and data['articles']:
                         return self.format_news_response(data['articles'], f"📰 **{category.title()} News**")
@@ -1573,31 +1493,17 @@ class NewsChatView(View):
                 except Exception as e:
                     logger.warning(f"Category search failed, falling back to general search: {e}")
             
-            # General search fallback
-            params = {
-                'q': query,
-                'sortBy': 'publishedAt',
-                'pageSize': 5,
-                'language': 'en',
-                'apiKey': self.api_key
-            }
-            
-            # Add date filter for recent news (last 30 days)
-            month_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-            params['from'] = month_ago
+            # Otherwise answer from the local article index when possible
+            local = search_payload(query, limit=5, match_all=False)
+            if local is not None:
+                return self.format_news_response(local['articles'], f"🔍 **Search Results for: {query}**")
             
-            response = requests.get(self.base_url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['status'] == 'ok' and data['articles']:
-                return self.format_news_response(data['articles'], f"🔍 **Search Results for: {query}**")
-            else:
-                return f"🔍 **No Results Found**\n\nNo recent news found for '{query}'. Try different keywords!"
+            # General search fallback
+            return self.search_response(self.client.fetch('everything', self.search_params(query)), query)
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Search request error: {e}")
-            return f"🔌 **Search Error**: Could not fetch news. Please try again."
+            return self.upstream_error("🔌 **Search Error**: Could not fetch news. Please try again.")
         except Exception as e:
             logger.error(f"Unexpected search error: {e}")
             return f"⚠️ **Search Error**: {str(e)}"
@@ -1683,22 +1589,19 @@ def test_api_view(request):
     """
     Direct API test endpoint - access at /api/test/
     """
-    api_key = "81509bdd2f3d4205bff00a258afce41b"
-    
     try:
-        response = requests.get(
-            "https://newsapi.org/v2/top-headlines",
+        response = news_client.request(
+            'top-headlines',
             params={
                 'country': 'us',
                 'pageSize': 3,
-                'apiKey': api_key
-            },
-            timeout=10
+            }
         )
         
         return JsonResponse({
             'status_code': response.status_code,
             'response': response.json() if response.status_code == 200 else response.text[:500],
+            'client_stats': news_client.stats(),
         })
         
     except Exception as e:
@@ -1706,3 +1609,26 @@ def test_api_view(request):
             'error': str(e)
         })
         
+
+
+@require_http_methods(["GET"])
+def health_api(request):
+    """Cheap upstream health check for frontend polling (no NewsAPI call)"""
+    health = news_client.health()
+    return JsonResponse({
+        'status': 'ok',
+        'healthy': health['healthy'],
+        'error': health['error'],
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def news_metrics_api(request):
+    """NewsAPI client metrics: request budget, circuit breaker, cache and pool usage"""
+    return JsonResponse({
+        'status': 'ok',
+        'metrics': news_client.stats(),
+        'activity': activity_recorder.stats(),
+        'avatars': avatar_processor.stats(),
+    })